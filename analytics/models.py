@@ -1,8 +1,13 @@
 # analytics/models.py
 
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
+from django.db.models import Case, Count, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Greatest
 from django.utils import timezone
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete, pre_save, pre_delete
 from django.dispatch import receiver
 
 from message_system.models import Message, MessageOpen
@@ -10,6 +15,7 @@ from campaigns.models import Campaign
 from smtp.models import SMTPAccount
 from deliverability.models import DomainCheck, EmailCheck
 from users.models import User
+from analytics.tasks import schedule_analytics_recompute, schedule_user_analytics_recompute
 
 
 # -------------------- Campaign Analytics --------------------
@@ -28,11 +34,17 @@ class CampaignAnalytics(models.Model):
         verbose_name_plural = "Campaign Analytics"  # ADD THIS LINE
 
     def compute(self):
-        msgs = self.campaign.messages.all()
-        self.total_messages = msgs.count()
-        self.sent_messages = msgs.filter(status="sent").count()
-        self.failed_messages = msgs.filter(status="failed").count()
-        self.opened_messages = MessageOpen.objects.filter(message__in=msgs).count()
+        # One pass over messages (joined to their opens) for all four counts
+        counts = Message.objects.filter(campaign_id=self.campaign_id).aggregate(
+            total=Count("id", distinct=True),
+            sent=Count("id", filter=Q(status="sent"), distinct=True),
+            failed=Count("id", filter=Q(status="failed"), distinct=True),
+            opened=Count("opens"),
+        )
+        self.total_messages = counts["total"]
+        self.sent_messages = counts["sent"]
+        self.failed_messages = counts["failed"]
+        self.opened_messages = counts["opened"]
         self.updated_at = timezone.now()
         self.save()
 
@@ -58,21 +70,30 @@ class UserAnalytics(models.Model):
         verbose_name_plural = "User Analytics"  # ADD THIS LINE
 
     def compute(self):
-        campaigns = getattr(self.user, "campaigns", User.objects.none()).all()
-        messages = Message.objects.filter(campaign__in=campaigns)
-        opens = MessageOpen.objects.filter(message__in=messages)
-        smtp_accounts = SMTPAccount.objects.filter(user=self.user)
+        # Conditional aggregation: one query per table instead of one per counter
+        campaigns = Campaign.objects.filter(user_id=self.user_id).aggregate(
+            total=Count("id"),
+            active=Count("id", filter=Q(status="active")),
+        )
+        messages = Message.objects.filter(campaign__user_id=self.user_id).aggregate(
+            total=Count("id", distinct=True),
+            opens=Count("opens"),
+        )
+        smtp_accounts = SMTPAccount.objects.filter(user_id=self.user_id).aggregate(
+            active=Count("id", filter=Q(status="active")),
+            failed=Count("id", filter=Q(status="failed")),
+        )
 
-        total_messages_count = messages.count()
+        total_messages_count = messages["total"]
 
-        self.total_campaigns = campaigns.count()
-        self.active_campaigns = campaigns.filter(status="active").count()
+        self.total_campaigns = campaigns["total"]
+        self.active_campaigns = campaigns["active"]
         self.total_messages = total_messages_count
-        self.average_message_opens = opens.count() / total_messages_count if total_messages_count else 0
-        self.smtp_active_accounts = smtp_accounts.filter(status="active").count()
-        self.smtp_failed_accounts = smtp_accounts.filter(status="failed").count()
-        self.domains_checked = DomainCheck.objects.filter(user=self.user).count()
-        self.emails_checked = EmailCheck.objects.filter(user=self.user).count()
+        self.average_message_opens = messages["opens"] / total_messages_count if total_messages_count else 0
+        self.smtp_active_accounts = smtp_accounts["active"]
+        self.smtp_failed_accounts = smtp_accounts["failed"]
+        self.domains_checked = DomainCheck.objects.filter(user_id=self.user_id).count()
+        self.emails_checked = EmailCheck.objects.filter(user_id=self.user_id).count()
         self.updated_at = timezone.now()
         self.save()
 
@@ -81,37 +102,211 @@ class UserAnalytics(models.Model):
 
 
 # -------------------- Signals --------------------
-# Campaign analytics updates
+# Signals apply counter deltas with a single UPDATE per event instead of
+# re-running compute(). Message and open bursts also queue a debounced
+# compute() job (analytics/tasks.py) to reconcile any drift. Bulk flows
+# wrap their writes in suspend_analytics() to skip the receivers entirely.
+
+_analytics_suspended = ContextVar("analytics_suspended", default=False)
+
+
+@contextmanager
+def suspend_analytics(user):
+    """
+    Skip the per-row analytics receivers for bulk writes or cascading
+    deletes made inside the block (this thread/context only), then queue
+    one debounced recompute of the user's analytics.
+    """
+    token = _analytics_suspended.set(True)
+    try:
+        yield
+    finally:
+        _analytics_suspended.reset(token)
+        schedule_user_analytics_recompute(user)
+
+
+MESSAGE_STATUS_COUNTERS = {"sent": "sent_messages", "failed": "failed_messages"}
+CAMPAIGN_STATUS_COUNTERS = {"active": "active_campaigns"}
+SMTP_STATUS_COUNTERS = {"active": "smtp_active_accounts", "failed": "smtp_failed_accounts"}
+
+# status was deferred when the instance was loaded
+_STATUS_NOT_LOADED = object()
+
+
+def _status_deltas(old_status, new_status, counters):
+    """Counter deltas for a status transition (old_status=None on create)."""
+    deltas = {}
+    if old_status == new_status:
+        return deltas
+    if old_status in counters:
+        deltas[counters[old_status]] = -1
+    if new_status in counters:
+        deltas[counters[new_status]] = deltas.get(counters[new_status], 0) + 1
+    return deltas
+
+
+def _average_opens(opens_delta, messages_delta):
+    """average_message_opens after adding opens/messages, from the implied open total."""
+    implied_opens = F("average_message_opens") * F("total_messages") + opens_delta
+    return Case(
+        When(
+            total_messages__gt=-messages_delta,
+            then=ExpressionWrapper(
+                Greatest(implied_opens, 0.0) / (F("total_messages") + messages_delta),
+                output_field=models.FloatField(),
+            ),
+        ),
+        default=Value(0.0),
+        output_field=models.FloatField(),
+    )
+
+
+def _apply_deltas(queryset, deltas, **extra):
+    """Apply counter deltas in one UPDATE, never going below zero. Returns rows updated."""
+    updates = {name: Greatest(F(name) + delta, 0) for name, delta in deltas.items() if delta}
+    updates.update(extra)
+    if not updates:
+        return 1  # nothing to change; treat as handled
+    return queryset.update(updated_at=timezone.now(), **updates)
+
+
+@receiver(post_init, sender=Message)
+@receiver(post_init, sender=Campaign)
+@receiver(post_init, sender=SMTPAccount)
+def track_original_status(sender, instance, **kwargs):
+    # Remember the loaded status so post_save can tell which counters moved
+    if "status" in instance.get_deferred_fields():
+        instance._analytics_status = _STATUS_NOT_LOADED
+    else:
+        instance._analytics_status = instance.status
+
+
+@receiver([pre_save, pre_delete], sender=Message)
+@receiver([pre_save, pre_delete], sender=Campaign)
+@receiver([pre_save, pre_delete], sender=SMTPAccount)
+def load_deferred_status(sender, instance, **kwargs):
+    # Loaded with .only()/.defer(): read the stored status before it changes
+    if _analytics_suspended.get():
+        return
+    if getattr(instance, "_analytics_status", None) is _STATUS_NOT_LOADED:
+        instance._analytics_status = (
+            sender._base_manager.filter(pk=instance.pk).values_list("status", flat=True).first()
+            if instance.pk else None
+        )
+
+
 @receiver([post_save, post_delete], sender=Message)
+def update_analytics_for_message(sender, instance, created=False, **kwargs):
+    if _analytics_suspended.get():
+        return
+    if kwargs["signal"] is post_delete:
+        deltas = _status_deltas(instance._analytics_status, None, MESSAGE_STATUS_COUNTERS)
+        deltas["total_messages"] = -1
+        opens = _average_opens(0, -1)
+    elif created:
+        deltas = _status_deltas(None, instance.status, MESSAGE_STATUS_COUNTERS)
+        deltas["total_messages"] = 1
+        opens = _average_opens(0, 1)
+    else:
+        deltas = _status_deltas(instance._analytics_status, instance.status, MESSAGE_STATUS_COUNTERS)
+        opens = None
+    instance._analytics_status = instance.status
+
+    campaign_updated = _apply_deltas(
+        CampaignAnalytics.objects.filter(campaign_id=instance.campaign_id), deltas
+    )
+    user_deltas = {"total_messages": deltas["total_messages"]} if "total_messages" in deltas else {}
+    user_extra = {"average_message_opens": opens} if opens is not None else {}
+    user_updated = _apply_deltas(
+        UserAnalytics.objects.filter(user__campaigns=instance.campaign_id), user_deltas, **user_extra
+    )
+
+    if kwargs["signal"] is post_save:
+        _ensure_campaign_analytics(instance.campaign_id, campaign_updated)
+        if not user_updated:
+            _ensure_user_analytics(_campaign_user_id(instance.campaign_id), user_updated)
+        schedule_analytics_recompute(instance.campaign_id)
+
+
 @receiver([post_save, post_delete], sender=MessageOpen)
-def update_campaign_analytics(sender, instance, **kwargs):
-    campaign = getattr(instance, "campaign", None) or getattr(getattr(instance, "message", None), "campaign", None)
-    if not campaign:
+def update_analytics_for_open(sender, instance, created=False, **kwargs):
+    if _analytics_suspended.get():
+        return
+    if kwargs["signal"] is post_save and not created:
         return
+    delta = 1 if created else -1
+
+    campaign_updated = _apply_deltas(
+        CampaignAnalytics.objects.filter(campaign__messages=instance.message_id),
+        {"opened_messages": delta},
+    )
+    user_updated = _apply_deltas(
+        UserAnalytics.objects.filter(user__campaigns__messages=instance.message_id),
+        {},
+        average_message_opens=_average_opens(delta, 0),
+    )
 
-    analytics, _ = CampaignAnalytics.objects.get_or_create(campaign=campaign)
-    analytics.compute()
+    if created:
+        campaign_id, user_id = (
+            Message.objects.filter(pk=instance.message_id)
+            .values_list("campaign_id", "campaign__user_id")
+            .get()
+        )
+        _ensure_campaign_analytics(campaign_id, campaign_updated)
+        _ensure_user_analytics(user_id, user_updated)
+        schedule_analytics_recompute(campaign_id)
 
 
-# User analytics updates
 @receiver([post_save, post_delete], sender=Campaign)
 @receiver([post_save, post_delete], sender=SMTPAccount)
+def update_user_analytics_for_status(sender, instance, created=False, **kwargs):
+    if _analytics_suspended.get():
+        return
+    counters = CAMPAIGN_STATUS_COUNTERS if sender is Campaign else SMTP_STATUS_COUNTERS
+    if kwargs["signal"] is post_delete:
+        deltas = _status_deltas(instance._analytics_status, None, counters)
+    elif created:
+        deltas = _status_deltas(None, instance.status, counters)
+    else:
+        deltas = _status_deltas(instance._analytics_status, instance.status, counters)
+    instance._analytics_status = instance.status
+
+    if sender is Campaign and (created or kwargs["signal"] is post_delete):
+        deltas["total_campaigns"] = 1 if created else -1
+
+    user_updated = _apply_deltas(UserAnalytics.objects.filter(user_id=instance.user_id), deltas)
+    if kwargs["signal"] is post_save:
+        _ensure_user_analytics(instance.user_id, user_updated)
+
+
 @receiver([post_save, post_delete], sender=DomainCheck)
 @receiver([post_save, post_delete], sender=EmailCheck)
-@receiver([post_save, post_delete], sender=Message)
-@receiver([post_save, post_delete], sender=MessageOpen)
-def update_user_analytics(sender, instance, **kwargs):
-    user = getattr(instance, "user", None)
-    if not user:
-        campaign = getattr(instance, "campaign", None) or getattr(getattr(instance, "message", None), "campaign", None)
-        user = getattr(campaign, "user", None) if campaign else None
-
-    if not user:
+def update_user_analytics_for_check(sender, instance, created=False, **kwargs):
+    if _analytics_suspended.get():
+        return
+    if not instance.user_id or (kwargs["signal"] is post_save and not created):
         return
+    counter = "domains_checked" if sender is DomainCheck else "emails_checked"
+
+    user_updated = _apply_deltas(
+        UserAnalytics.objects.filter(user_id=instance.user_id), {counter: 1 if created else -1}
+    )
+    if created:
+        _ensure_user_analytics(instance.user_id, user_updated)
+
+
+def _ensure_campaign_analytics(campaign_id, updated):
+    # First event for this campaign: build the row from a full compute
+    if not updated:
+        analytics, _ = CampaignAnalytics.objects.get_or_create(campaign_id=campaign_id)
+        analytics.compute()
+
+
+def _ensure_user_analytics(user_id, updated):
+    if not updated and user_id:
+        analytics, _ = UserAnalytics.objects.get_or_create(user_id=user_id)
+        analytics.compute()
 
-    analytics, _ = UserAnalytics.objects.get_or_create(user=user)
-    analytics.compute()
 
-# Note: These signals will trigger compute() on every save/delete,
-# which may impact performance if you have large numbers of messages or campaigns.
-# Consider adding @transaction.atomic or batching updates for high-scale systems.
\ No newline at end of file
+def _campaign_user_id(campaign_id):
+    return Campaign.objects.filter(pk=campaign_id).values_list("user_id", flat=True).first()
@@ -0,0 +1,67 @@
+# analytics/tasks.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from queues.services import enqueue_job, job_handler
+
+RECOMPUTE_ANALYTICS_JOB = "recompute_analytics"
+
+
+def _debounce(key):
+    """Return the debounce delay if this is the first event of the window, else None."""
+    debounce = getattr(settings, "ANALYTICS_RECOMPUTE_DEBOUNCE", 5)
+    if not cache.add(f"analytics:debounce:{key}", 1, timeout=debounce):
+        return None
+    return debounce
+
+
+def schedule_analytics_recompute(campaign_id):
+    """
+    Queue a recompute of a campaign's analytics and its owner's, at most once
+    per debounce window. Events within the window coalesce into the one job,
+    so the signal path only pays for a cache add.
+    """
+    debounce = _debounce(campaign_id)
+    if debounce is None:
+        return None
+
+    from campaigns.models import Campaign
+
+    campaign = Campaign.objects.select_related("user").filter(pk=campaign_id).first()
+    if campaign is None:
+        return None
+    return enqueue_job(
+        campaign.user,
+        RECOMPUTE_ANALYTICS_JOB,
+        {"campaign_id": campaign_id},
+        scheduled_for=timezone.now() + timedelta(seconds=debounce),
+    )
+
+
+def schedule_user_analytics_recompute(user):
+    """Debounced recompute of a user's analytics after writes that skip signals (bulk upserts)."""
+    debounce = _debounce(f"user:{user.id}")
+    if debounce is None:
+        return None
+    return enqueue_job(
+        user,
+        RECOMPUTE_ANALYTICS_JOB,
+        {},
+        scheduled_for=timezone.now() + timedelta(seconds=debounce),
+    )
+
+
+@job_handler(RECOMPUTE_ANALYTICS_JOB)
+def recompute_analytics(job):
+    """Reconcile the incremental counters with a full compute()."""
+    from analytics.models import CampaignAnalytics, UserAnalytics
+
+    campaign_analytics = CampaignAnalytics.objects.filter(campaign_id=job.payload.get("campaign_id")).first()
+    if campaign_analytics:
+        campaign_analytics.compute()
+
+    user_analytics, _ = UserAnalytics.objects.get_or_create(user=job.user)
+    user_analytics.compute()
@@ -1,7 +1,15 @@
 # analytics/tests.py
 
+import io
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from rest_framework.test import APIClient
 from unittest.mock import patch
 
@@ -10,6 +18,9 @@ from campaigns.models import Campaign
 from message_system.models import Message, MessageOpen
 from smtp.models import SMTPAccount
 from deliverability.models import DomainCheck, EmailCheck
+from analytics.models import CampaignAnalytics, UserAnalytics, suspend_analytics
+from analytics.tasks import RECOMPUTE_ANALYTICS_JOB
+from queues.models import QueueJob
 
 User = get_user_model()
 
@@ -85,3 +96,131 @@ class AnalyticsSmokeTest(TestCase):
         """Ensure user analytics endpoint returns 200."""
         res = self.client.get("/api/me/")
         self.assertEqual(res.status_code, 200)
+
+    def test_incremental_counters_match_compute(self):
+        """Signal-driven counter deltas agree with a full recompute."""
+        campaign_analytics = CampaignAnalytics.objects.get(campaign=self.campaign)
+        user_analytics = UserAnalytics.objects.get(user=self.user)
+        self.assertEqual(campaign_analytics.total_messages, 1)
+        self.assertEqual(campaign_analytics.sent_messages, 1)
+        self.assertEqual(campaign_analytics.opened_messages, 1)
+        self.assertEqual(user_analytics.domains_checked, 1)
+        self.assertEqual(user_analytics.emails_checked, 1)
+
+        incremental = (
+            campaign_analytics.total_messages, campaign_analytics.sent_messages,
+            campaign_analytics.failed_messages, campaign_analytics.opened_messages,
+        )
+        user_incremental = (
+            user_analytics.total_campaigns, user_analytics.total_messages,
+            user_analytics.average_message_opens, user_analytics.smtp_active_accounts,
+            user_analytics.domains_checked, user_analytics.emails_checked,
+        )
+        campaign_analytics.compute()
+        user_analytics.compute()
+        self.assertEqual(incremental, (
+            campaign_analytics.total_messages, campaign_analytics.sent_messages,
+            campaign_analytics.failed_messages, campaign_analytics.opened_messages,
+        ))
+        self.assertEqual(user_incremental, (
+            user_analytics.total_campaigns, user_analytics.total_messages,
+            user_analytics.average_message_opens, user_analytics.smtp_active_accounts,
+            user_analytics.domains_checked, user_analytics.emails_checked,
+        ))
+
+    def test_message_open_updates_counters_without_recompute(self):
+        """Recording an open issues counter UPDATEs rather than COUNT queries."""
+        with patch("analytics.models.CampaignAnalytics.compute") as compute, \
+                patch("analytics.models.UserAnalytics.compute") as user_compute:
+            MessageOpen.objects.record_open(self.msg, raw_ip="5.6.7.8", user_agent_family="Firefox")
+        compute.assert_not_called()
+        user_compute.assert_not_called()
+        self.assertEqual(CampaignAnalytics.objects.get(campaign=self.campaign).opened_messages, 2)
+
+    def test_message_events_queue_one_debounced_recompute(self):
+        """A burst of events within the debounce window queues a single recompute job."""
+        cache.clear()
+        QueueJob.objects.filter(job_type=RECOMPUTE_ANALYTICS_JOB).delete()
+        for ip in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            MessageOpen.objects.record_open(self.msg, raw_ip=ip, user_agent_family="Chrome")
+
+        jobs = QueueJob.objects.filter(job_type=RECOMPUTE_ANALYTICS_JOB)
+        self.assertEqual(jobs.count(), 1)
+
+        jobs.update(scheduled_for=timezone.now())
+        UserAnalytics.objects.filter(user=self.user).update(total_messages=0)
+        call_command("process_jobs", stdout=io.StringIO())
+        self.assertEqual(jobs.get().status, "completed")
+        self.assertEqual(UserAnalytics.objects.get(user=self.user).total_messages, 1)
+
+    def test_compute_uses_conditional_aggregates(self):
+        """compute() issues one aggregate per table rather than a COUNT per counter."""
+        campaign_analytics = CampaignAnalytics.objects.get(campaign=self.campaign)
+        user_analytics = UserAnalytics.objects.get(user=self.user)
+
+        # aggregate + save
+        with self.assertNumQueries(2):
+            campaign_analytics.compute()
+        # campaigns, messages, smtp, domain checks, email checks + save
+        with self.assertNumQueries(6):
+            user_analytics.compute()
+        self.assertEqual(campaign_analytics.opened_messages, 1)
+        self.assertEqual(user_analytics.average_message_opens, 1.0)
+
+    def test_suspend_analytics_skips_receivers_and_queues_recompute(self):
+        """Writes inside suspend_analytics() leave counters alone until the queued recompute runs."""
+        cache.clear()
+        QueueJob.objects.filter(job_type=RECOMPUTE_ANALYTICS_JOB).delete()
+
+        with suspend_analytics(self.user):
+            self.msg.delete()
+
+        self.assertEqual(CampaignAnalytics.objects.get(campaign=self.campaign).total_messages, 1)
+        job = QueueJob.objects.get(job_type=RECOMPUTE_ANALYTICS_JOB)
+        self.assertEqual(job.user, self.user)
+
+        QueueJob.objects.filter(pk=job.pk).update(scheduled_for=timezone.now())
+        call_command("process_jobs", stdout=io.StringIO())
+        self.assertEqual(UserAnalytics.objects.get(user=self.user).total_messages, 0)
+
+    def test_analytics_endpoint_serves_stored_counters_while_fresh(self):
+        """Reads only recompute rows older than ANALYTICS_REFRESH_INTERVAL."""
+        with patch("analytics.models.UserAnalytics.compute") as compute:
+            res = self.client.get("/api/analytics/me/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["total_messages"], 1)
+        compute.assert_not_called()
+
+        UserAnalytics.objects.filter(user=self.user).update(updated_at=timezone.now() - timedelta(minutes=5))
+        with patch("analytics.models.UserAnalytics.compute") as compute:
+            self.client.get("/api/analytics/me/")
+        compute.assert_called_once()
+
+    def test_status_change_on_deferred_instance_moves_counters(self):
+        """Instances loaded without their status still report the transition."""
+        msg = Message.objects.only("id", "campaign").get(pk=self.msg.pk)
+        msg.mark_failed()
+        analytics = CampaignAnalytics.objects.get(campaign=self.campaign)
+        self.assertEqual((analytics.sent_messages, analytics.failed_messages), (0, 1))
+
+    def test_message_receivers_skip_related_lookups(self):
+        """Receivers use the foreign key ids rather than loading campaign and user rows."""
+        msg = Message.objects.get(pk=self.msg.pk)
+        with CaptureQueriesContext(connection) as queries:
+            msg.mark_failed()
+            MessageOpen.objects.record_open(msg, raw_ip="9.9.9.9", user_agent_family="Chrome")
+        lookups = [
+            q["sql"] for q in queries
+            if q["sql"].startswith(('SELECT "campaigns_campaign"', 'SELECT "users_user"'))
+        ]
+        self.assertEqual(lookups, [])
+
+    def test_smtp_auto_disable_and_reset_move_counters(self):
+        """Disabling an account through mark_failure() and resetting it keep the SMTP counters exact."""
+        for _ in range(3):
+            self.smtp_account.mark_failure()
+        self.assertEqual(self.smtp_account.status, "disabled")
+        self.assertEqual(UserAnalytics.objects.get(user=self.user).smtp_active_accounts, 0)
+
+        SMTPAccount.objects.get(pk=self.smtp_account.pk).reset_failures()
+        self.assertEqual(UserAnalytics.objects.get(user=self.user).smtp_active_accounts, 1)
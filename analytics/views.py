@@ -1,6 +1,10 @@
 # analytics/views.py
 
+from datetime import timedelta
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -13,6 +17,17 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+def _refresh_if_stale(analytics, created):
+    """
+    Serve the stored counters (kept current by the signal deltas and the
+    debounced recompute job); only run a full compute() for a new row or
+    one not refreshed within ANALYTICS_REFRESH_INTERVAL seconds.
+    """
+    interval = getattr(settings, "ANALYTICS_REFRESH_INTERVAL", 60)
+    if created or analytics.updated_at < timezone.now() - timedelta(seconds=interval):
+        analytics.compute()
+
+
 class CampaignAnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -23,10 +38,10 @@ class CampaignAnalyticsView(APIView):
             user=request.user
         )
 
-        analytics, _ = CampaignAnalytics.objects.get_or_create(
+        analytics, created = CampaignAnalytics.objects.get_or_create(
             campaign=campaign
         )
-        analytics.compute()
+        _refresh_if_stale(analytics, created)
 
         serializer = CampaignAnalyticsSerializer(analytics)
         return Response(serializer.data)
@@ -41,10 +56,10 @@ class UserAnalyticsView(APIView):
         else:
             user = request.user
 
-        analytics, _ = UserAnalytics.objects.get_or_create(
+        analytics, created = UserAnalytics.objects.get_or_create(
             user=user
         )
-        analytics.compute()
+        _refresh_if_stale(analytics, created)
 
         serializer = UserAnalyticsSerializer(analytics)
         return Response(serializer.data)
@@ -291,7 +291,11 @@ class CampaignForm(forms.ModelForm):
                     status='subscribed'
                     # is_active=True  ← REMOVED THIS FILTER
                 )
-                if message and contacts.exists():
-                    message.add_recipients(contacts)
+                if message:
+                    message.add_recipients(contacts.values_list('id', 'email'))
+            
+            # The recipients were cleared above; recount even if none were added
+            if message:
+                message.refresh_recipient_counts()
         
         return campaign
\ No newline at end of file
@@ -121,9 +121,7 @@ class Campaign(models.Model):
             contacts = group.get_contacts().filter(status='subscribed', is_active=True)
             
             # Add recipients
-            message.add_recipients(contacts)
-            
-            return contacts.count()
+            return message.add_recipients(contacts.values_list('id', 'email'))
         except ContactGroup.DoesNotExist:
             return 0
     
@@ -142,8 +140,7 @@ class Campaign(models.Model):
             is_active=True  # Contact model has this field
         )
         
-        message.add_recipients(contacts)
-        return contacts.count()
+        return message.add_recipients(contacts.values_list('id', 'email'))
     
     def get_recipient_count(self):
         """Get number of recipients for this campaign."""
@@ -1,13 +1,12 @@
 # campaigns/tasks.py - UPDATED VERSION with tracking pixel
 import smtplib
 import logging
-import uuid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from django.utils import timezone
 from django.conf import settings
+from smtp import pool as smtp_pool
 import socket
-import ssl
 
 logger = logging.getLogger(__name__)
 
@@ -31,19 +30,16 @@ def send_campaign_emails(campaign_id, limit=None):
             return 0, 0
         
         # Get the campaign's message
-        message = campaign.messages.first()
+        message = campaign.messages.select_related('sender_smtp').first()
         if not message:
             logger.error(f"Campaign {campaign_id} has no message")
             return 0, 0
+        message.campaign = campaign
         
-        # Ensure message has a UUID for tracking
-        if not message.uuid:
-            message.uuid = str(uuid.uuid4())
-            message.save(update_fields=['uuid'])
-            logger.info(f"Generated UUID for message {message.id}: {message.uuid}")
-        
-        # Get pending recipients
-        recipients = message.recipients.filter(status='pending')
+        # Get pending recipients; contacts are joined so send_single_email
+        # doesn't query per recipient (the related manager already attaches
+        # the loaded message, with its campaign and SMTP account)
+        recipients = message.recipients.filter(status='pending').select_related('contact')
         if limit:
             recipients = recipients[:limit]
         
@@ -58,16 +54,16 @@ def send_campaign_emails(campaign_id, limit=None):
                 if success:
                     sent_count += 1
                     recipient.mark_sent()
-                    logger.info(f"Sent to {recipient.contact.email}")
+                    logger.info(f"Sent to {recipient.recipient_email}")
                 else:
                     failed_count += 1
                     recipient.mark_failed("Send failed")
-                    logger.error(f"Failed to send to {recipient.contact.email}")
+                    logger.error(f"Failed to send to {recipient.recipient_email}")
                     
             except Exception as e:
                 failed_count += 1
                 recipient.mark_failed(str(e))
-                logger.error(f"Error sending to {recipient.contact.email}: {str(e)}")
+                logger.error(f"Error sending to {recipient.recipient_email}: {str(e)}")
         
         # Simple status update
         if sent_count > 0 and failed_count == 0:
@@ -213,36 +209,11 @@ def send_via_smtp(smtp_account, email_msg, to_email):
     Simple SMTP sending.
     """
     try:
-        # FIX: SMTPAccount has different field names
-        host = smtp_account.smtp_host
-        port = smtp_account.smtp_port
-        username = smtp_account.smtp_user
-        password = smtp_account.get_password()
-        
-        if not password:
-            logger.error(f"Failed to get password for SMTP account {smtp_account.id}")
-            return False
-        
-        # Always use TLS for security (assume port 587 for TLS, 465 for SSL)
-        if port == 465:
-            # SSL connection
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(host, port, context=context) as server:
-                server.login(username, password)
-                server.send_message(email_msg)
-                logger.debug(f"Email sent via SSL to {to_email}")
-                return True
-        else:
-            # TLS connection (default for port 587)
-            with smtplib.SMTP(host, port, timeout=30) as server:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(username, password)
-                server.send_message(email_msg)
-                logger.debug(f"Email sent via TLS to {to_email}")
-                return True
-                
+        # Pooled per-thread session: TLS + AUTH once per account, not per email
+        smtp_pool.send_message(smtp_account, email_msg)
+        logger.debug(f"Email sent to {to_email}")
+        return True
+
     except smtplib.SMTPAuthenticationError as e:
         logger.error(f"SMTP authentication error to {to_email}: {str(e)}")
         # Mark SMTP account as failed
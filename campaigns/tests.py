@@ -3,9 +3,13 @@ from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from users.models import User
 from plans.models import Plan, DEFAULT_LIMITS
 from .models import Campaign
+from .tasks import send_campaign_emails
 
 class CampaignModelTests(TestCase):
 
@@ -84,3 +88,56 @@ class CampaignModelTests(TestCase):
             status="draft"
         )
         self.assertEqual(str(campaign), "My Campaign (draft)")
+
+    @patch("campaigns.tasks.send_via_smtp", return_value=True)
+    def test_send_campaign_emails_loads_recipients_once(self, send):
+        """Sending doesn't re-fetch the contact, message, campaign or SMTP account per recipient."""
+        from message_system.models import Contact, Message
+        from smtp.models import SMTPAccount
+
+        smtp_account = SMTPAccount.objects.create(
+            user=self.user_premium, smtp_host="smtp.test.com", smtp_port=587,
+            smtp_user="sender@test.com", smtp_password_encrypted="x",
+        )
+
+        def sent_queries(count):
+            campaign = Campaign.objects.create_campaign(
+                user=self.user_premium, name=f"Send {count}", status="active"
+            )
+            message = Message.objects.create_message(
+                campaign=campaign, subject="Hi", body_html="<p>Hi</p>", sender_smtp=smtp_account
+            )
+            contacts = Contact.objects.bulk_create([
+                Contact(user=self.user_premium, email=f"c{count}-{i}@test.com") for i in range(count)
+            ])
+            message.add_recipients((c.id, c.email) for c in contacts)
+            with self.settings(SITE_URL="https://app.test"), CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(send_campaign_emails(campaign.id), (count, 0))
+            return len(ctx.captured_queries)
+
+        # Each extra recipient costs only its two UPDATEs (status + sent_count)
+        self.assertEqual(sent_queries(4) - sent_queries(2), 2 * 2)
+
+    def test_detail_view_query_count_is_constant(self):
+        """Recipient and open stats on the detail page don't grow with the audience."""
+        from django.urls import reverse
+        from message_system.models import Contact, Message, MessageOpen
+
+        self.client.force_login(self.user_premium)
+
+        def detail_queries(count):
+            campaign = Campaign.objects.create_campaign(user=self.user_premium, name=f"Detail {count}")
+            message = Message.objects.create_message(campaign=campaign, subject="Hi", body_html="<p>Hi</p>")
+            contacts = Contact.objects.bulk_create([
+                Contact(user=self.user_premium, email=f"d{count}-{i}@test.com") for i in range(count)
+            ])
+            message.add_recipients((c.id, c.email) for c in contacts)
+            for i, contact in enumerate(contacts):
+                MessageOpen.objects.record_open(message, contact=contact, raw_ip=f"10.1.{count}.{i}")
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse("campaigns:detail", args=[campaign.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["recipient_count"], count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(detail_queries(2), detail_queries(5))
@@ -6,6 +6,7 @@ from django.views.generic import ListView, CreateView, UpdateView, DetailView, V
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.db import connection
+from analytics.models import suspend_analytics
 from .models import Campaign
 from .forms import CampaignForm
 
@@ -116,8 +117,8 @@ class CampaignDetailView(LoginRequiredMixin, DetailView):
         if message:
             # Get recipient statistics
             recipients = message.recipients.all()
-            context['recipient_count'] = recipients.count()
-            context['sent_count'] = recipients.filter(status='sent').count()
+            context['recipient_count'] = message.recipient_count
+            context['sent_count'] = message.sent_count
             context['delivered_count'] = recipients.filter(status='delivered').count()
             context['failed_count'] = recipients.filter(status='failed').count()
             
@@ -134,7 +135,7 @@ class CampaignDetailView(LoginRequiredMixin, DetailView):
                 context['open_rate'] = 0
             
             # Get recent opens
-            context['recent_opens'] = opens.select_related('recipient__contact').order_by('-opened_at')[:10]
+            context['recent_opens'] = opens.select_related('recipient').order_by('-opened_at')[:10]
         
         return context
 
@@ -147,8 +148,10 @@ class CampaignDeleteView(LoginRequiredMixin, View):
         campaign_name = campaign.name
         
         try:
-            # Method 1: Try Django ORM cascade delete
-            campaign.delete()
+            # Method 1: Try Django ORM cascade delete; skip the per-row
+            # analytics receivers and reconcile once afterwards
+            with suspend_analytics(request.user):
+                campaign.delete()
             messages.success(request, f'Campaign "{campaign_name}" deleted successfully!')
             
         except Exception as e:
@@ -0,0 +1,26 @@
+# core/renderers.py
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to DRF's stdlib renderer
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer backed by orjson, which serializes large lists and
+    datetimes in C. Types orjson does not know (Decimal, lazy strings, ...)
+    go through DRF's encoder. Without orjson installed it behaves exactly
+    like JSONRenderer.
+    """
+
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=self._default, option=orjson.OPT_NAIVE_UTC)
@@ -1,5 +1,6 @@
 import os
 import socket  # ADD THIS IMPORT
+import sys
 from pathlib import Path
 from urllib.parse import urlparse  # ADD THIS IMPORT
 
@@ -177,9 +178,36 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Reuse connections across requests instead of reconnecting each
+        # time; health checks drop ones the server has closed
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# =============================================
+# TEST RUN CONFIGURATION
+# =============================================
+
+# True for `manage.py test` and pytest-xdist workers
+TESTING = (len(sys.argv) > 1 and sys.argv[1] == "test") or "PYTEST_XDIST_WORKER" in os.environ
+
+if TESTING:
+    class DisableMigrations:
+        """Build test tables straight from the models (same as --nomigrations)."""
+
+        def __contains__(self, item):
+            return True
+
+        def __getitem__(self, item):
+            return None
+
+    MIGRATION_MODULES = DisableMigrations()
+
+    # Fixtures create users with passwords; PBKDF2 is deliberately slow and
+    # tests don't need a secure hash
+    PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -217,6 +245,9 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (contact CSV imports are stored here until their job runs)
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", BASE_DIR / "media"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -250,6 +281,159 @@ EMAIL_HOST_PASSWORD = ''
 EMAIL_USE_TLS = False
 EMAIL_USE_SSL = False
 
+# =============================================
+# REST FRAMEWORK
+# =============================================
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "domain_check": "60/min",
+    },
+}
+
+# =============================================
+# CACHE CONFIGURATION
+# =============================================
+
+# Set REDIS_URL (e.g. redis://localhost:6379/0) to share the cache between
+# processes; requires the `redis` package. Falls back to per-process memory.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# =============================================
+# DELIVERABILITY SETTINGS
+# =============================================
+
+# Seconds a cached domain check is served as fresh when the lookup
+# reports no DNS TTL; otherwise the record TTL is clamped to MIN/MAX
+DOMAIN_CHECK_TTL = 300
+DOMAIN_CHECK_MIN_TTL = 60
+DOMAIN_CHECK_MAX_TTL = 86400
+
+# Seconds a cached domain check is kept as a fallback when a lookup fails
+DOMAIN_CHECK_STALE_TTL = 86400
+
+# Seconds a user's in-flight check of a domain blocks duplicate requests
+DOMAIN_CHECK_LOCK_TTL = 10
+
+# Worker threads used to probe addresses in a bulk email check
+SMTP_BULK_WORKERS = 16
+
+# Maximum number of addresses accepted by a single bulk email check
+EMAIL_BULK_CHECK_LIMIT = 1000
+
+# Bulk checks larger than this are queued as a background job (see process_jobs)
+EMAIL_BULK_SYNC_LIMIT = 50
+
+# =============================================
+# SMTP SETTINGS
+# =============================================
+
+# Socket timeout (seconds) for SMTP sessions
+SMTP_TIMEOUT = 30
+
+# Pooled SMTP sessions (smtp/pool.py) are recycled after this many sends
+# or this many seconds, whichever comes first
+SMTP_POOL_MAX_MESSAGES = 10000
+SMTP_POOL_MAX_AGE = 300
+
+# =============================================
+# BACKGROUND JOB SETTINGS
+# =============================================
+
+# Seconds before the first retry of a failed QueueJob; doubles per attempt
+QUEUE_JOB_RETRY_BACKOFF = 30
+
+# Seconds a QueueJob may stay "processing" before it is assumed its worker
+# died and it is picked up again (counted as a retry). Keep it above the
+# longest expected job, or a slow job will be run twice.
+QUEUE_JOB_TIMEOUT = 900
+
+# Attempts for a queued email send (smtp/tasks.py) before the account is
+# charged a failure
+SMTP_SEND_MAX_RETRIES = 5
+
+# =============================================
+# TRACKING SETTINGS
+# =============================================
+
+# Key for hashing open and click IPs (message_system.models.hash_ip); defaults to SECRET_KEY
+IP_HASH_SALT = os.environ.get('IP_HASH_SALT', SECRET_KEY)
+
+# Recorded clicks are buffered per process and bulk-inserted once this many
+# are pending or the oldest is this many seconds old (tracking/buffer.py)
+CLICK_BUFFER_SIZE = 500
+CLICK_BUFFER_MAX_AGE = 2
+
+# Tracking-pixel opens are buffered the same way (message_system/buffer.py)
+OPEN_BUFFER_SIZE = 500
+OPEN_BUFFER_MAX_AGE = 2
+
+# Buffers flush from a background timer (core/write_buffer.py); test runs
+# flush inline instead, inside the test transaction. A batch that fails to
+# write is retried this many times before it is dropped
+WRITE_BUFFER_TIMER = not TESTING
+WRITE_BUFFER_MAX_RETRIES = 3
+
+# Repeat pixel hits for the same message and IP within this many seconds are
+# dropped (message_system.models.is_repeat_open); 0 records every hit
+OPEN_DEDUP_WINDOW = 60
+
+# Seconds the pixel remembers an unknown message UUID and skips its lookup
+BEACON_MISS_TTL = 3600
+
+# =============================================
+# ANALYTICS SETTINGS
+# =============================================
+
+# Seconds during which a user's analytics events coalesce into a single
+# queued recompute (see analytics/tasks.py)
+ANALYTICS_RECOMPUTE_DEBOUNCE = 5
+
+# Analytics endpoints serve stored counters and only recompute rows that
+# have not been refreshed for this many seconds
+ANALYTICS_REFRESH_INTERVAL = 60
+
+# =============================================
+# PROFILING (django-silk, development only)
+# =============================================
+
+# Opt-in: `pip install django-silk`, set ENABLE_SILK=1 and run migrate;
+# profiles are then browsable by superusers at /silk/
+ENABLE_SILK = DEBUG and not TESTING and os.environ.get('ENABLE_SILK') == '1'
+
+if ENABLE_SILK:
+    INSTALLED_APPS.append("silk")
+    MIDDLEWARE.append("silk.middleware.SilkyMiddleware")
+
+    SILKY_AUTHENTICATION = True
+    SILKY_AUTHORISATION = True
+    SILKY_PERMISSIONS = lambda user: user.is_superuser
+    SILKY_META = True
+    SILKY_PYTHON_PROFILER = True
+
+    # Silk trims its own tables on a sample of requests, so no scheduled
+    # garbage-collect job is needed to keep them bounded
+    SILKY_MAX_RECORDED_REQUESTS = 10000
+    SILKY_MAX_RECORDED_REQUESTS_CHECK_PERCENT = 10
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -1,8 +1,10 @@
 # core/tests/test_all_urls.py
 from django.test import TestCase
-from rest_framework.test import APIClient
-from django.urls import get_resolver
+from rest_framework.test import APIClient, APIRequestFactory
+from django.urls import get_resolver, resolve, Resolver404
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
 
 class URLSmokeTest(TestCase):
     """
@@ -12,6 +14,7 @@ class URLSmokeTest(TestCase):
     
     def setUp(self):
         self.client = APIClient()
+        self.factory = APIRequestFactory()
         User = get_user_model()
         
         # Create test user if possible
@@ -26,6 +29,27 @@ class URLSmokeTest(TestCase):
         except Exception:
             self.user = None
     
+    def _probe(self, url, method="get", data=None):
+        """
+        Resolve the URL and call the matched view directly.
+        Skips the WSGI handler and middleware stack; only the session and
+        anonymous user the views rely on are attached to the request.
+        Returns the status code (404 when the URL does not resolve).
+        """
+        try:
+            match = resolve(url)
+        except Resolver404:
+            return 404
+
+        request = getattr(self.factory, method)(url, data or {})
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+            response.render()
+        return response.status_code
+    
     def get_all_non_admin_urls(self):
         """Get a list of all non-admin URL patterns."""
         resolver = get_resolver()
@@ -106,8 +130,7 @@ class URLSmokeTest(TestCase):
             
             # Test GET first (most common)
             try:
-                response = self.client.get(url, follow=True)
-                status = response.status_code
+                status = self._probe(url)
                 
                 if status == 500:
                     errors.append(f"❌ GET {url} - 500 Server Error")
@@ -138,8 +161,7 @@ class URLSmokeTest(TestCase):
         for url, data in post_endpoints:
             print(f"\nPOST {url}")
             try:
-                response = self.client.post(url, data, follow=True)
-                status = response.status_code
+                status = self._probe(url, method="post", data=data)
                 
                 if status == 500:
                     errors.append(f"❌ POST {url} - 500 Server Error")
@@ -0,0 +1,49 @@
+# core/tests/test_write_buffer.py
+import threading
+
+from django.test import SimpleTestCase
+
+from core.write_buffer import WriteBuffer
+
+
+class WriteBufferTests(SimpleTestCase):
+    def make_buffer(self, write):
+        buffer = WriteBuffer("items", write, "TEST_BUFFER_SIZE", "TEST_BUFFER_MAX_AGE")
+        self.addCleanup(buffer.flush)
+        return buffer
+
+    def test_timer_flushes_a_quiet_buffer(self):
+        """Pending items are written after max age without another add()."""
+        written = threading.Event()
+        batches = []
+
+        def write(batch):
+            batches.append(batch)
+            written.set()
+
+        buffer = self.make_buffer(write)
+        with self.settings(WRITE_BUFFER_TIMER=True, TEST_BUFFER_SIZE=10, TEST_BUFFER_MAX_AGE=0.05):
+            buffer.add(1)
+            buffer.add(2)
+            self.assertTrue(written.wait(2))
+        self.assertEqual(batches, [[1, 2]])
+
+    def test_failed_batch_is_requeued_then_dropped(self):
+        """A failing batch is retried on later flushes, then given up on."""
+        attempts = []
+
+        def write(batch):
+            attempts.append(list(batch))
+            raise RuntimeError("database is locked")
+
+        buffer = self.make_buffer(write)
+        with self.settings(WRITE_BUFFER_TIMER=False, TEST_BUFFER_SIZE=10, WRITE_BUFFER_MAX_RETRIES=1):
+            buffer.add("a")
+            with self.assertLogs("core.write_buffer", "ERROR"):
+                self.assertEqual(buffer.flush(), 0)
+            buffer.add("b")
+            with self.assertLogs("core.write_buffer", "ERROR") as logs:
+                self.assertEqual(buffer.flush(), 0)
+            self.assertIn("dropped", logs.output[0])
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(attempts, [["a"], ["a", "b"]])
@@ -1,4 +1,5 @@
 # core/urls.py
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
@@ -21,4 +22,8 @@ urlpatterns = [
     path('smtp/', include('smtp.urls')),
     
     path('campaigns/', include('campaigns.urls')),
-]
\ No newline at end of file
+]
+
+# Request profiling in development (see ENABLE_SILK in settings)
+if getattr(settings, "ENABLE_SILK", False):
+    urlpatterns += [path("silk/", include("silk.urls", namespace="silk"))]
@@ -0,0 +1,107 @@
+# core/write_buffer.py
+"""
+In-process write buffer shared by the click and open trackers.
+
+Items are held in memory and handed to a writer in one batch per flush
+instead of one INSERT per request. A batch is flushed once `size` items
+are pending, `max_age` seconds after the first one was queued (so a quiet
+process still writes), and at interpreter exit. Scheduled flushes run on a
+short-lived daemon timer thread that closes its database connection
+afterwards, so queuing never writes on the request path.
+
+With WRITE_BUFFER_TIMER = False (test runs) no thread is started: a full
+buffer is flushed inline and anything else waits for flush().
+
+A batch that fails to write is put back in front of the buffer and retried
+by the next flush, up to WRITE_BUFFER_MAX_RETRIES failures in a row; after
+that it is logged and dropped, so one bad row can't wedge the buffer.
+Pending items are lost if the process is killed before a flush.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    def __init__(self, name, write, size_setting, age_setting):
+        """
+        `write(batch)` persists a list of items; size and age are read from
+        the named settings on every call so tests can override them.
+        """
+        self.name = name
+        self._write = write
+        self._size_setting = size_setting
+        self._age_setting = age_setting
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self._failures = 0
+        atexit.register(self.flush)
+
+    def add(self, item):
+        """Queue an item; the write happens on a later flush."""
+        with self._lock:
+            self._pending.append(item)
+            full = len(self._pending) >= getattr(settings, self._size_setting, 500)
+            if getattr(settings, "WRITE_BUFFER_TIMER", True):
+                self._schedule(0 if full else None)
+                return
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every pending item. Returns the number written."""
+        with self._lock:
+            batch = self._pending[:]
+            self._pending.clear()
+        if not batch:
+            return 0
+
+        try:
+            self._write(batch)
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                retry = self._failures <= getattr(settings, "WRITE_BUFFER_MAX_RETRIES", 3)
+                if retry:
+                    self._pending[:0] = batch
+                    if getattr(settings, "WRITE_BUFFER_TIMER", True):
+                        self._schedule(None)
+                else:
+                    self._failures = 0
+            if retry:
+                logger.error(f"Failed to flush {len(batch)} buffered {self.name}, requeued: {e}")
+            else:
+                logger.error(f"Failed to flush {len(batch)} buffered {self.name}, dropped after retries: {e}")
+            return 0
+
+        with self._lock:
+            self._failures = 0
+        return len(batch)
+
+    def _schedule(self, delay):
+        """Start the flush timer (caller holds the lock). delay=None: after max age if idle."""
+        if self._timer is not None:
+            if delay is None:
+                return
+            self._timer.cancel()
+        if delay is None:
+            delay = getattr(settings, self._age_setting, 2)
+        self._timer = threading.Timer(delay, self._timed_flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            if self._timer is threading.current_thread():
+                self._timer = None
+        try:
+            self.flush()
+        finally:
+            # This thread's connection is never reused
+            connections.close_all()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-15 22:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliverability', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='domaincheck',
+            index=models.Index(fields=['user', '-last_checked'], name='deliverabil_user_id_0ce6f6_idx'),
+        ),
+    ]
@@ -48,6 +48,7 @@ class DomainCheck(models.Model):
         indexes = [
             models.Index(fields=["domain"]),
             models.Index(fields=["last_checked"]),
+            models.Index(fields=["user", "-last_checked"]),
         ]
 
     def __str__(self):
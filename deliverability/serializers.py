@@ -0,0 +1,28 @@
+# deliverability/serializers.py
+from rest_framework import serializers
+from .models import DomainCheck, EmailCheck
+
+class DomainCheckSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DomainCheck
+        fields = [
+            "domain",
+            "spf",
+            "dkim",
+            "dmarc",
+            "risk_score",
+            "risk_level",
+            "last_checked",
+        ]
+
+class DomainCheckResultSerializer(DomainCheckSerializer):
+    """Serializes a services.DomainCheckResult for the check endpoint."""
+    stale = serializers.BooleanField(read_only=True)
+
+    class Meta(DomainCheckSerializer.Meta):
+        fields = DomainCheckSerializer.Meta.fields + ["stale"]
+
+class EmailCheckSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EmailCheck
+        fields = ["email", "status", "domain_type"]
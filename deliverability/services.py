@@ -1,8 +1,44 @@
 # deliverability/services.py
-from dataclasses import dataclass
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from analytics.tasks import schedule_user_analytics_recompute
 from .models import DomainCheck, EmailCheck
 
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+
+def _load_domain_set(filename):
+    """Read a one-domain-per-line list (``#`` comments allowed) into a frozenset."""
+    with open(DATA_DIR / filename, encoding="utf-8") as f:
+        return frozenset(
+            line.strip().lower() for line in f
+            if line.strip() and not line.startswith("#")
+        )
+
+
+# Loaded once at import; classification is a set lookup with no network I/O
+DISPOSABLE_EMAIL_DOMAINS = _load_domain_set("disposable_domains.txt")
+FREE_EMAIL_DOMAINS = _load_domain_set("free_domains.txt")
+
+# Shared pool for bulk SMTP probes (network-bound, so threads scale well)
+bulk_check_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "SMTP_BULK_WORKERS", 16),
+    thread_name_prefix="email-bulk-check",
+)
+
+
 @dataclass
 class DomainCheckResult:
     domain: str
@@ -12,10 +48,44 @@ class DomainCheckResult:
     risk_score: int
     risk_level: str
     last_checked: str
+    stale: bool = False
+    # Lowest TTL (seconds) of the DNS records consulted; None if unknown
+    ttl: Optional[int] = None
 
-def check_domain(domain: str, user=None) -> DomainCheckResult:
+
+def normalize_domain(domain: str) -> str:
+    """Domains are case-insensitive; check, cache and store them in one form."""
+    return domain.strip().lower()
+
+
+def _domain_cache_key(domain: str) -> str:
+    # Hash so long subdomains never exceed cache key length limits
+    return f"dcheck:{hashlib.sha1(domain.encode('utf-8')).hexdigest()}"
+
+
+def domain_check_lock_key(domain: str, user) -> str:
+    return f"{_domain_cache_key(domain)}:lock:{user.id}"
+
+
+def _freshness_seconds(result: DomainCheckResult) -> int:
+    """
+    How long a result stays fresh: the upstream DNS TTL clamped to
+    [DOMAIN_CHECK_MIN_TTL, DOMAIN_CHECK_MAX_TTL], or DOMAIN_CHECK_TTL when
+    the lookup did not observe any TTL.
+    """
+    if result.ttl is None:
+        return getattr(settings, "DOMAIN_CHECK_TTL", 300)
+    return max(
+        getattr(settings, "DOMAIN_CHECK_MIN_TTL", 60),
+        min(result.ttl, getattr(settings, "DOMAIN_CHECK_MAX_TTL", 86400)),
+    )
+
+
+def _lookup_domain(domain: str) -> DomainCheckResult:
     """
     Dummy deliverability check with hardcoded results for tests.
+    A real resolver should set `ttl` to the lowest answer.rrset.ttl seen
+    across the SPF/DKIM/DMARC lookups so caching follows upstream DNS.
     """
     spf = "pass"
     dkim = "pass" if domain.endswith(".com") else "fail"
@@ -28,22 +98,6 @@ def check_domain(domain: str, user=None) -> DomainCheckResult:
         risk_score = 4
         risk_level = "medium"
 
-    now = timezone.now()
-
-    if user:
-        DomainCheck.objects.update_or_create(
-            domain=domain,
-            user=user,
-            defaults={
-                "spf": spf,
-                "dkim": dkim,
-                "dmarc": dmarc,
-                "risk_score": risk_score,
-                "risk_level": risk_level,
-                "last_checked": now,
-            },
-        )
-
     return DomainCheckResult(
         domain=domain,
         spf=spf,
@@ -51,31 +105,154 @@ def check_domain(domain: str, user=None) -> DomainCheckResult:
         dmarc=dmarc,
         risk_score=risk_score,
         risk_level=risk_level,
-        last_checked=now.isoformat(),
+        last_checked=timezone.now().isoformat(),
+    )
+
+
+def record_domain_check(result: DomainCheckResult, user) -> None:
+    """
+    Upsert the DomainCheck row for a check result.
+    """
+    # Single INSERT ... ON CONFLICT DO UPDATE instead of SELECT + write
+    DomainCheck.objects.bulk_create(
+        [
+            DomainCheck(
+                domain=result.domain,
+                user=user,
+                spf=result.spf,
+                dkim=result.dkim,
+                dmarc=result.dmarc,
+                risk_score=result.risk_score,
+                risk_level=result.risk_level,
+                last_checked=parse_datetime(result.last_checked),
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["domain", "user"],
+        update_fields=["spf", "dkim", "dmarc", "risk_score", "risk_level", "last_checked", "updated_at"],
     )
 
 
+def check_domain(domain: str, user=None) -> DomainCheckResult:
+    """
+    Return deliverability results for a domain, served from the cache
+    while fresh. If a lookup fails, the last cached result is returned
+    with stale=True.
+    """
+    domain = normalize_domain(domain)
+    key = _domain_cache_key(domain)
+    entry = cache.get(key)
+    now = timezone.now()
+
+    if entry and entry["stale_at"] > now:
+        result = DomainCheckResult(**entry["result"])
+    else:
+        try:
+            result = _lookup_domain(domain)
+        except Exception as e:
+            if not entry:
+                raise
+            logger.warning(f"Domain lookup failed for {domain}, serving stale result: {e}")
+            result = replace(DomainCheckResult(**entry["result"]), stale=True)
+        else:
+            fresh_for = _freshness_seconds(result)
+            cache.set(
+                key,
+                {
+                    "result": asdict(result),
+                    "generated_at": now,
+                    "stale_at": now + timedelta(seconds=fresh_for),
+                },
+                timeout=max(fresh_for, getattr(settings, "DOMAIN_CHECK_STALE_TTL", 86400)),
+            )
+
+    if user:
+        record_domain_check(result, user)
+
+    return result
+
+
 @dataclass
 class EmailCheckResult:
     email: str
     status: str
     domain_type: str
 
+def record_email_check(result: EmailCheckResult, user) -> None:
+    """
+    Upsert the EmailCheck row for a validation result.
+    """
+    EmailCheck.objects.bulk_create(
+        [EmailCheck(email=result.email, user=user, status=result.status, domain_type=result.domain_type)],
+        update_conflicts=True,
+        unique_fields=["email", "user"],
+        update_fields=["status", "domain_type", "updated_at"],
+    )
+
+
 def validate_email_smtp(email: str, user=None) -> EmailCheckResult:
     """
     Dummy SMTP/email validation for testing.
+    Disposable and free providers are classified from local domain sets.
     """
+    domain = email.rpartition("@")[2].lower()
     status = "valid" if "@" in email else "invalid"
-    domain_type = "free" if email.endswith("@example.com") else "premium"
 
+    if domain in DISPOSABLE_EMAIL_DOMAINS:
+        domain_type = "disposable"
+    elif domain in FREE_EMAIL_DOMAINS or domain == "example.com":
+        domain_type = "free"
+    else:
+        domain_type = "premium"
+
+    result = EmailCheckResult(email=email, status=status, domain_type=domain_type)
     if user:
-        EmailCheck.objects.update_or_create(
-            email=email,
-            user=user,
-            defaults={
-                "status": status,
-                "domain_type": domain_type,
-            },
+        record_email_check(result, user)
+
+    return result
+
+
+def _validate_email_safely(email: str) -> EmailCheckResult:
+    """
+    Validate one address without touching the DB; a failing probe yields
+    an "unknown" result (not persisted) instead of failing the whole batch.
+    """
+    try:
+        return validate_email_smtp(email=email)
+    except Exception as e:
+        logger.warning(f"Bulk validation failed for {email}: {e}")
+        return EmailCheckResult(email=email, status="unknown", domain_type="unknown")
+
+
+def record_email_checks(results, user, batch_size=500) -> None:
+    """
+    Upsert EmailCheck rows for many results in batched INSERT statements.
+    Repeated addresses keep their last result, since one upsert statement
+    cannot touch the same row twice.
+    """
+    latest = {result.email: result for result in results}
+    rows = [
+        EmailCheck(email=r.email, user=user, status=r.status, domain_type=r.domain_type)
+        for r in latest.values()
+    ]
+    with transaction.atomic():
+        EmailCheck.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["email", "user"],
+            update_fields=["status", "domain_type", "updated_at"],
         )
 
-    return EmailCheckResult(email=email, status=status, domain_type=domain_type)
+
+def validate_email_batch(emails, user) -> list:
+    """
+    Validate a list of addresses concurrently, then persist all results
+    from the calling thread in one batched upsert.
+    """
+    results = list(bulk_check_executor.map(_validate_email_safely, emails))
+    # Failed probes aren't stored, so they can't overwrite an earlier result
+    record_email_checks([r for r in results if r.status != "unknown"], user)
+    # bulk_create sends no signals, so refresh the analytics counters once
+    schedule_user_analytics_recompute(user)
+    return results
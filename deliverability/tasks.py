@@ -0,0 +1,16 @@
+# deliverability/tasks.py
+from queues.services import job_handler
+from .serializers import EmailCheckSerializer
+from .services import validate_email_batch
+
+EMAIL_BULK_CHECK_JOB = "email_bulk_check"
+
+
+@job_handler(EMAIL_BULK_CHECK_JOB)
+def bulk_validate(job):
+    """
+    Validate the emails queued by EmailBulkCheckView.
+    Results are returned so they are stored on the job for polling.
+    """
+    emails = job.payload.get("emails", [])
+    return EmailCheckSerializer(validate_email_batch(emails, job.user), many=True).data
@@ -1,10 +1,18 @@
 # deliverability/tests.py
+import io
+import json
+from dataclasses import replace
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+from django.core.cache import cache
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from unittest.mock import patch
 from deliverability.models import DomainCheck, EmailCheck
-from deliverability.services import DomainCheckResult, EmailCheckResult
+from deliverability.services import DomainCheckResult, EmailCheckResult, validate_email_smtp, _lookup_domain, _freshness_seconds, domain_check_lock_key
 
 User = get_user_model()
 
@@ -18,6 +26,7 @@ class DeliverabilityTests(TestCase):
         )
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
+        cache.clear()
 
     # -------------------
     # Domain Tests
@@ -58,6 +67,75 @@ class DeliverabilityTests(TestCase):
         check = DomainCheck.objects.get(domain="example.org", user=self.user)
         self.assertEqual(check.risk_level, "medium")
 
+    def test_domain_check_writes_in_one_query(self):
+        """A domain check persists its result with a single upsert"""
+        self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        with self.assertNumQueries(1):
+            response = self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_duplicate_domain_check_in_flight_is_refused(self):
+        """A second check of a domain already being checked returns 429"""
+        cache.add(domain_check_lock_key("example.org", self.user), True)
+        response = self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(DomainCheck.objects.filter(domain="example.org", user=self.user).exists())
+
+    def test_domain_check_served_from_cache(self):
+        """A fresh cached result skips the domain lookup"""
+        with patch("deliverability.services._lookup_domain", wraps=_lookup_domain) as mock_lookup:
+            self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+            response = self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.assertEqual(mock_lookup.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["stale"])
+
+    def test_domain_check_normalizes_case(self):
+        """Mixed-case input is checked, cached and stored as the lowercase domain"""
+        other = User.objects.create_user(email="other@example.com", password="pass123")
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+        other_client.post("/deliverability/domains/check/", {"domain": " EXAMPLE.com "}, format="json")
+
+        response = self.client.post("/deliverability/domains/check/", {"domain": "example.com"}, format="json")
+        self.assertEqual(response.data["domain"], "example.com")
+        self.assertEqual(response.data["risk_score"], 7)
+        self.assertEqual(
+            set(DomainCheck.objects.values_list("domain", "user")),
+            {("example.com", other.id), ("example.com", self.user.id)},
+        )
+
+    def test_domain_check_freshness_follows_dns_ttl(self):
+        """The cache freshness window is the DNS TTL, clamped to the configured bounds"""
+        result = _lookup_domain("example.org")
+        with self.settings(DOMAIN_CHECK_TTL=300, DOMAIN_CHECK_MIN_TTL=60, DOMAIN_CHECK_MAX_TTL=86400):
+            self.assertEqual(_freshness_seconds(result), 300)
+            self.assertEqual(_freshness_seconds(replace(result, ttl=3600)), 3600)
+            self.assertEqual(_freshness_seconds(replace(result, ttl=5)), 60)
+            self.assertEqual(_freshness_seconds(replace(result, ttl=604800)), 86400)
+
+    def test_domain_check_falls_back_to_stale_cache(self):
+        """A failing lookup serves the expired cached result flagged as stale"""
+        with self.settings(DOMAIN_CHECK_TTL=0):
+            self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+            with patch("deliverability.services._lookup_domain", side_effect=OSError("resolver down")):
+                response = self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["stale"])
+        self.assertEqual(response.data["risk_level"], "medium")
+
+    def test_domain_export_streams_full_history(self):
+        """Domain export streams every check as a JSON array"""
+        for domain in ["a.org", "b.org", "c.org"]:
+            self.client.post("/deliverability/domains/check/", {"domain": domain}, format="json")
+
+        response = self.client.get("/deliverability/domains/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([c["domain"] for c in data], ["c.org", "b.org", "a.org"])
+        self.assertIsNotNone(parse_datetime(data[0]["last_checked"]))
+
     # -------------------
     # Email Tests
     # -------------------
@@ -74,6 +152,20 @@ class DeliverabilityTests(TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertTrue(EmailCheck.objects.filter(email="valid@example.com", user=self.user).exists())
 
+    def test_email_check_writes_in_one_query(self):
+        """An email check persists its result with a single upsert"""
+        self.client.post("/deliverability/emails/check/", {"email": "valid@example.com"}, format="json")
+        with self.assertNumQueries(1):
+            response = self.client.post("/deliverability/emails/check/", {"email": "valid@example.com"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(EmailCheck.objects.filter(email="valid@example.com", user=self.user).count(), 1)
+
+    def test_email_domain_type_classification(self):
+        """Disposable and free providers are classified from the local domain lists"""
+        self.assertEqual(validate_email_smtp("someone@Mailinator.com").domain_type, "disposable")
+        self.assertEqual(validate_email_smtp("someone@gmail.com").domain_type, "free")
+        self.assertEqual(validate_email_smtp("someone@acme.io").domain_type, "premium")
+
     @patch("deliverability.services.validate_email_smtp")
     def test_bulk_email_check(self, mock_validate):
         """Test bulk email validation"""
@@ -89,3 +181,112 @@ class DeliverabilityTests(TestCase):
 
         for email in emails:
             self.assertTrue(EmailCheck.objects.filter(email=email, user=self.user).exists())
+
+    def test_bulk_email_check_does_not_store_failed_probes(self):
+        """A probe that raises is reported as unknown but leaves the stored result alone"""
+        EmailCheck.objects.create(user=self.user, email="two@example.com", status="valid", domain_type="premium")
+
+        def validate(email, user=None):
+            if email == "two@example.com":
+                raise OSError("connection refused")
+            return EmailCheckResult(email=email, status="valid", domain_type="free")
+
+        with patch("deliverability.services.validate_email_smtp", side_effect=validate):
+            response = self.client.post(
+                "/deliverability/emails/bulk-check/",
+                {"emails": ["one@example.com", "two@example.com"]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        failed = EmailCheck.objects.get(user=self.user, email="two@example.com")
+        self.assertEqual((failed.status, failed.domain_type), ("valid", "premium"))
+        self.assertTrue(EmailCheck.objects.filter(user=self.user, email="one@example.com").exists())
+
+    def test_bulk_email_check_writes_one_insert(self):
+        """Bulk results are upserted in a single statement, repeated addresses collapsed"""
+        emails = ["one@example.com", "two@example.com", "one@example.com"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/deliverability/emails/bulk-check/", {"emails": emails}, format="json")
+        self.assertEqual(response.status_code, 201)
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "deliverability_emailcheck"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(EmailCheck.objects.filter(user=self.user).count(), 2)
+
+    def test_repeat_domain_check_updates_existing_row(self):
+        """Re-checking a domain upserts the existing DomainCheck row"""
+        self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.assertEqual(DomainCheck.objects.filter(domain="example.org", user=self.user).count(), 1)
+
+    def test_bulk_email_check_rejects_oversized_batch(self):
+        """Bulk validation refuses more emails than EMAIL_BULK_CHECK_LIMIT"""
+        with self.settings(EMAIL_BULK_CHECK_LIMIT=2):
+            emails = ["one@example.com", "two@example.com", "three@example.com"]
+            response = self.client.post("/deliverability/emails/bulk-check/", {"emails": emails}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EmailCheck.objects.filter(user=self.user).exists())
+
+    def test_large_bulk_email_check_is_queued(self):
+        """Bulk validation above EMAIL_BULK_SYNC_LIMIT runs as a background job"""
+        emails = ["one@example.com", "two@example.com", "three@example.com"]
+        with self.settings(EMAIL_BULK_SYNC_LIMIT=2):
+            response = self.client.post("/deliverability/emails/bulk-check/", {"emails": emails}, format="json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["job_id"]
+        self.assertFalse(EmailCheck.objects.filter(user=self.user).exists())
+
+        call_command("process_jobs", stdout=io.StringIO())
+
+        response = self.client.get(f"/deliverability/emails/bulk-check/{job_id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "completed")
+        self.assertEqual([r["email"] for r in response.data["results"]], emails)
+        self.assertEqual(EmailCheck.objects.filter(user=self.user).count(), 3)
+
+    def test_domain_list_returns_users_checks(self):
+        """Domain list returns the user's checks newest first (ETag aggregate + one page query)"""
+        self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        self.client.post("/deliverability/domains/check/", {"domain": "example.net"}, format="json")
+        with self.assertNumQueries(2):
+            response = self.client.get("/deliverability/domains/")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([c["domain"] for c in results], ["example.net", "example.org"])
+        self.assertIn("last_checked", results[0])
+
+    def test_domain_list_conditional_get(self):
+        """Unchanged history answers If-None-Match with 304; a new check changes the ETag"""
+        self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        first = self.client.get("/deliverability/domains/")
+        etag = first["ETag"]
+
+        with self.assertNumQueries(1):
+            cached = self.client.get("/deliverability/domains/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+
+        self.client.post("/deliverability/domains/check/", {"domain": "example.net"}, format="json")
+        changed = self.client.get("/deliverability/domains/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_domain_list_renders_json_body(self):
+        """Rendered list body is plain JSON matching the serialized data"""
+        self.client.post("/deliverability/domains/check/", {"domain": "example.org"}, format="json")
+        response = self.client.get("/deliverability/domains/", HTTP_ACCEPT="application/json")
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = json.loads(response.content)
+        self.assertEqual(body["results"][0]["domain"], "example.org")
+        self.assertEqual(body["results"][0]["last_checked"], response.data["results"][0]["last_checked"])
+
+    @patch("deliverability.views.DomainCheckCursorPagination.page_size", 2)
+    def test_domain_list_is_paginated(self):
+        """Domain list pages through the history with a cursor"""
+        for domain in ["a.org", "b.org", "c.org"]:
+            self.client.post("/deliverability/domains/check/", {"domain": domain}, format="json")
+
+        first = self.client.get("/deliverability/domains/")
+        self.assertEqual([c["domain"] for c in first.data["results"]], ["c.org", "b.org"])
+        second = self.client.get(first.data["next"])
+        self.assertEqual([c["domain"] for c in second.data["results"]], ["a.org"])
+        self.assertIsNone(second.data["next"])
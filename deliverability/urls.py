@@ -1,6 +1,6 @@
 # deliverability/urls.py
 from django.urls import path
-from .views import DomainCheckView, DomainCheckListView, EmailCheckView, EmailBulkCheckView
+from .views import DomainCheckView, DomainCheckListView, DomainCheckExportView, EmailCheckView, EmailBulkCheckView, EmailBulkCheckJobView
 
 app_name = "deliverability"
 
@@ -10,10 +10,12 @@ urlpatterns = [
     # -------------------
     path("domains/check/", DomainCheckView.as_view(), name="domain-check"),
     path("domains/", DomainCheckListView.as_view(), name="domain-check-list"),
+    path("domains/export/", DomainCheckExportView.as_view(), name="domain-check-export"),
 
     # -------------------
     # Email Deliverability (SMTP)
     # -------------------
     path("emails/check/", EmailCheckView.as_view(), name="email-check"),
     path("emails/bulk-check/", EmailBulkCheckView.as_view(), name="email-bulk-check"),
+    path("emails/bulk-check/<int:job_id>/", EmailBulkCheckJobView.as_view(), name="email-bulk-check-job"),
 ]
@@ -1,55 +1,111 @@
 # deliverability/views.py
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Max
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from rest_framework.views import APIView
+from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .services import check_domain, validate_email_smtp
+from rest_framework.throttling import ScopedRateThrottle
+from queues.models import QueueJob
+from queues.services import enqueue_job
+from .services import check_domain, validate_email_smtp, validate_email_batch, domain_check_lock_key, normalize_domain
+from .tasks import EMAIL_BULK_CHECK_JOB
 from .models import DomainCheck, EmailCheck
+from .serializers import DomainCheckSerializer, DomainCheckResultSerializer, EmailCheckSerializer
 
 # -------------------
 # Domain Deliverability
 # -------------------
 class DomainCheckView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "domain_check"
 
     def post(self, request, format=None):
-        domain = request.data.get("domain")
+        domain = normalize_domain(str(request.data.get("domain") or ""))
         if not domain:
             return Response({"error": "Domain is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        result = check_domain(domain=domain, user=request.user)
-
-        return Response(
-            {
-                "domain": result.domain,
-                "spf": result.spf,
-                "dkim": result.dkim,
-                "dmarc": result.dmarc,
-                "risk_score": result.risk_score,
-                "risk_level": result.risk_level,
-                "last_checked": result.last_checked,
-            },
-            status=status.HTTP_200_OK
+        # Only one check per (user, domain) in flight; duplicates are refused
+        lock_key = domain_check_lock_key(domain, request.user)
+        if not cache.add(lock_key, True, timeout=getattr(settings, "DOMAIN_CHECK_LOCK_TTL", 10)):
+            return Response(
+                {"error": "A check for this domain is already in progress."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+        try:
+            result = check_domain(domain=domain, user=request.user)
+        finally:
+            cache.delete(lock_key)
+
+        return Response(DomainCheckResultSerializer(result).data, status=status.HTTP_200_OK)
+
+class DomainCheckCursorPagination(CursorPagination):
+    """Stable pages over the newest-first history, even while checks are inserted."""
+    page_size = 50
+    ordering = "-last_checked"
+
+
+class DomainCheckListView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = DomainCheckSerializer
+    pagination_class = DomainCheckCursorPagination
+
+    def get_queryset(self):
+        # Narrow dict rows: no model instantiation, only the columns returned
+        return (
+            DomainCheck.objects.filter(user=self.request.user)
+            .values(*DomainCheckSerializer.Meta.fields)
         )
 
-class DomainCheckListView(APIView):
+    def get_etag(self):
+        # Changes whenever a check is added, removed or re-run
+        state = DomainCheck.objects.filter(user=self.request.user).aggregate(
+            latest=Max("last_checked"), count=Count("id")
+        )
+        latest = state["latest"].timestamp() if state["latest"] else 0
+        return f'"{state["count"]}-{latest:.6f}"'
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
+class DomainCheckExportView(APIView):
+    """
+    Full check history as one JSON array, streamed in chunks so memory
+    stays bounded regardless of how many checks the user has.
+    """
     permission_classes = [IsAuthenticated]
+    chunk_size = 2000
 
     def get(self, request, format=None):
-        checks = DomainCheck.objects.filter(user=request.user).order_by("-last_checked")
-        data = [
-            {
-                "domain": c.domain,
-                "spf": c.spf,
-                "dkim": c.dkim,
-                "dmarc": c.dmarc,
-                "risk_score": c.risk_score,
-                "risk_level": c.risk_level,
-                "last_checked": c.last_checked.isoformat(),
-            }
-            for c in checks
-        ]
-        return Response(data, status=status.HTTP_200_OK)
+        rows = (
+            DomainCheck.objects.filter(user=request.user)
+            .values(*DomainCheckSerializer.Meta.fields)
+            .order_by("-last_checked")
+            .iterator(chunk_size=self.chunk_size)
+        )
+        return StreamingHttpResponse(self._stream(rows), content_type="application/json")
+
+    def _stream(self, rows):
+        # Same encoding as the API renderer (core/renderers.py)
+        yield b"["
+        for i, row in enumerate(rows):
+            yield (b"," if i else b"") + orjson.dumps(row, option=orjson.OPT_NAIVE_UTC)
+        yield b"]"
 
 # -------------------
 # Email Deliverability
@@ -64,14 +120,7 @@ class EmailCheckView(APIView):
 
         result = validate_email_smtp(email=email, user=request.user)
 
-        return Response(
-            {
-                "email": result.email,
-                "status": result.status,
-                "domain_type": result.domain_type,
-            },
-            status=status.HTTP_201_CREATED
-        )
+        return Response(EmailCheckSerializer(result).data, status=status.HTTP_201_CREATED)
 
 class EmailBulkCheckView(APIView):
     permission_classes = [IsAuthenticated]
@@ -81,13 +130,39 @@ class EmailBulkCheckView(APIView):
         if not emails or not isinstance(emails, list):
             return Response({"error": "A list of emails is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        results = []
-        for email in emails:
-            result = validate_email_smtp(email=email, user=request.user)
-            results.append({
-                "email": result.email,
-                "status": result.status,
-                "domain_type": result.domain_type,
-            })
+        max_emails = getattr(settings, "EMAIL_BULK_CHECK_LIMIT", 1000)
+        if len(emails) > max_emails:
+            return Response(
+                {"error": f"At most {max_emails} emails can be checked per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Large batches are handed to the job queue so the request returns immediately
+        if len(emails) > getattr(settings, "EMAIL_BULK_SYNC_LIMIT", 50):
+            job = enqueue_job(request.user, EMAIL_BULK_CHECK_JOB, {"emails": emails})
+            return Response(
+                {"job_id": job.id, "status": job.status},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        results = validate_email_batch(emails, request.user)
+        return Response({"results": EmailCheckSerializer(results, many=True).data}, status=status.HTTP_201_CREATED)
+
 
-        return Response({"results": results}, status=status.HTTP_201_CREATED)
+class EmailBulkCheckJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, format=None):
+        job = get_object_or_404(
+            QueueJob,
+            id=job_id,
+            user=request.user,
+            job_type=EMAIL_BULK_CHECK_JOB
+        )
+
+        data = {"job_id": job.id, "status": job.status}
+        if job.status == "completed":
+            data["results"] = job.payload.get("result", [])
+        elif job.status == "failed":
+            data["error"] = job.error_message
+        return Response(data, status=status.HTTP_200_OK)
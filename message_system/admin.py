@@ -12,4 +12,7 @@ class MessageAdmin(admin.ModelAdmin):
 class MessageOpenAdmin(admin.ModelAdmin):
     list_display = ['message', 'beacon_uuid', 'opened_at']
     list_filter = ['opened_at']
-    search_fields = ['message__subject', 'beacon_uuid']
\ No newline at end of file
+    search_fields = ['message__subject', 'beacon_uuid']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
\ No newline at end of file
@@ -14,9 +14,11 @@ class MessageOpenViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
 
+        # The serializer reads only MessageOpen's own columns, so no related
+        # rows are joined in; the user filter needs just the JOIN to campaign
         qs = MessageOpen.objects.filter(
             message__campaign__user=user
-        ).select_related("message")
+        ).only(*MessageOpenSerializer.Meta.fields)
 
         # Optional: filter by message UUID via query param
         beacon_uuid = self.request.query_params.get("beacon_uuid")
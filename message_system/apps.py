@@ -1,7 +1,18 @@
 # message_system/apps.py
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class MessageSystemConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "message_system"
+
+    def ready(self):
+        from .search import repair_search_index_after_migrate
+
+        # Table remakes in later migrations drop the search index triggers
+        post_migrate.connect(
+            repair_search_index_after_migrate,
+            sender=self,
+            dispatch_uid="message_system.repair_search_index",
+        )
@@ -0,0 +1,26 @@
+# message_system/buffer.py
+"""
+In-process open write buffer for the tracking pixel (core/write_buffer.py).
+
+Opens are written with one batch per flush, so the beacon response never
+waits on an INSERT: flushes run on the buffer's timer thread once
+OPEN_BUFFER_SIZE opens are pending or the oldest is OPEN_BUFFER_MAX_AGE
+seconds old.
+
+Flushes go through MessageOpen.objects.write_batch(), which also marks
+the linked recipients opened and queues analytics recomputes.
+"""
+from core.write_buffer import WriteBuffer
+
+
+def _write_opens(batch):
+    from .models import MessageOpen
+
+    MessageOpen.objects.write_batch(batch)
+
+
+open_buffer = WriteBuffer("opens", _write_opens, "OPEN_BUFFER_SIZE", "OPEN_BUFFER_MAX_AGE")
+
+# Queue an unsaved MessageOpen / write every pending open (returns the count)
+buffer_open = open_buffer.add
+flush_opens = open_buffer.flush
@@ -1,4 +1,6 @@
 # message_system/forms.py
+import csv
+import io
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Contact, ContactGroup
@@ -22,29 +24,37 @@ class ContactForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
+        group_choices = kwargs.pop('group_choices', None)
         super().__init__(*args, **kwargs)
         
         if self.user:
             # Limit groups to user's groups
             self.fields['groups'].queryset = ContactGroup.objects.filter(user=self.user)
+            if group_choices is not None:
+                # Rendering uses the shared choices instead of querying per form;
+                # submitted values are still validated against the queryset
+                self.fields['groups'].choices = group_choices
             
             # For existing contact, exclude its own email from uniqueness check
             if self.instance and self.instance.pk:
                 self.fields['email'].disabled = True
     
+    @staticmethod
+    def group_choices_for(user):
+        """
+        Evaluate the user's groups once as field choices, to pass as
+        `group_choices` to every ContactForm rendered on the same page.
+        """
+        return [(group.pk, str(group)) for group in ContactGroup.objects.filter(user=user)]
+    
     def clean_email(self):
-        email = self.cleaned_data['email'].lower().strip()
-        
-        # Check for duplicate email for this user
-        if self.user:
-            qs = Contact.objects.filter(user=self.user, email=email)
-            if self.instance and self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-            
-            if qs.exists():
-                raise ValidationError(f'A contact with email {email} already exists.')
-        
-        return email
+        # Uniqueness per user is enforced by the unique_email_per_user
+        # constraint; views report a violation via add_duplicate_error()
+        return self.cleaned_data['email'].lower().strip()
+
+    def add_duplicate_error(self):
+        email = self.cleaned_data['email']
+        self.add_error('email', ValidationError(f'A contact with email {email} already exists.'))
 
 
 class ContactGroupForm(forms.ModelForm):
@@ -58,35 +68,24 @@ class ContactGroupForm(forms.ModelForm):
                 'placeholder': '{"status": "subscribed", "tags": ["customer", "vip"]}'
             }),
         }
+        # filter_criteria is a forms.JSONField, which parses the input once
+        # and rejects invalid JSON itself
+        error_messages = {
+            'filter_criteria': {'invalid': 'Invalid JSON format for filter criteria.'},
+        }
     
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
     
-    def clean_filter_criteria(self):
-        criteria = self.cleaned_data.get('filter_criteria', '')
-        if criteria and self.cleaned_data.get('is_dynamic', False):
-            try:
-                # Validate JSON
-                import json
-                json.loads(criteria)
-            except json.JSONDecodeError:
-                raise ValidationError('Invalid JSON format for filter criteria.')
-        return criteria
-    
     def clean_name(self):
-        name = self.cleaned_data['name'].strip()
-        
-        # Check for duplicate name for this user
-        if self.user:
-            qs = ContactGroup.objects.filter(user=self.user, name=name)
-            if self.instance and self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-            
-            if qs.exists():
-                raise ValidationError(f'A group with name "{name}" already exists.')
-        
-        return name
+        # Uniqueness per user is enforced by the unique_group_name_per_user
+        # constraint; views report a violation via add_duplicate_error()
+        return self.cleaned_data['name'].strip()
+
+    def add_duplicate_error(self):
+        name = self.cleaned_data['name']
+        self.add_error('name', ValidationError(f'A group with name "{name}" already exists.'))
 
 
 class ContactImportForm(forms.Form):
@@ -106,4 +105,20 @@ class ContactImportForm(forms.Form):
         if csv_file.size > 5 * 1024 * 1024:
             raise ValidationError('File size must be less than 5MB.')
         
+        # Read only the header row; malformed uploads are rejected before
+        # the importer parses the whole file
+        csv_file.seek(0)
+        text = io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline='')
+        try:
+            header = next(csv.reader(text), [])
+        except (UnicodeDecodeError, csv.Error):
+            raise ValidationError('The CSV file could not be read. Please upload a UTF-8 encoded CSV.')
+        finally:
+            # Detach so closing the wrapper never closes the upload itself
+            text.detach()
+            csv_file.seek(0)
+        
+        if 'email' not in {column.strip().lower() for column in header}:
+            raise ValidationError('The CSV file must have an "email" column.')
+        
         return csv_file
\ No newline at end of file
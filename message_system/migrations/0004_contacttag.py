@@ -0,0 +1,40 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_tags(apps, schema_editor):
+    Contact = apps.get_model('message_system', 'Contact')
+    ContactTag = apps.get_model('message_system', 'ContactTag')
+    batch = []
+    for contact_id, tags in Contact.objects.exclude(tags='').values_list('id', 'tags').iterator():
+        names = {tag.strip().lower()[:100] for tag in tags.split(',') if tag.strip()}
+        batch.extend(ContactTag(contact_id=contact_id, name=name) for name in names)
+        if len(batch) >= 1000:
+            ContactTag.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ContactTag.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0003_contact_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_entries', to='message_system.contact')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'contact'], name='message_sys_name_27d0e9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('contact', 'name'), name='unique_tag_per_contact')],
+            },
+        ),
+        migrations.RunPython(index_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:09
+
+import uuid
+from django.db import migrations, models
+
+
+def rewrite_uuids(apps, schema_editor):
+    # Backends without a native uuid type store UUIDField as 32 hex chars;
+    # rows written by the old CharField hold the 36-char dashed form
+    if schema_editor.connection.features.has_native_uuid_field:
+        return
+    Message = apps.get_model('message_system', 'Message')
+    for pk, value in Message.objects.values_list('pk', 'uuid').iterator():
+        Message.objects.filter(pk=pk).update(uuid=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0004_contacttag'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.RunPython(rewrite_uuids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0005_message_uuid_uuidfield'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='messageopen',
+            name='message_sys_opened__77ca31_idx',
+        ),
+        migrations.AddIndex(
+            model_name='messageopen',
+            index=models.Index(fields=['message', '-opened_at'], name='open_msg_time_idx'),
+        ),
+    ]
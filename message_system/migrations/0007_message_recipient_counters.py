@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:11
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_recipients(apps, schema_editor):
+    Message = apps.get_model('message_system', 'Message')
+    counts = Message.objects.annotate(
+        total=Count('recipients'),
+        sent=Count('recipients', filter=Q(recipients__sent_at__isnull=False)),
+    ).values_list('pk', 'total', 'sent')
+    for pk, total, sent in counts.iterator():
+        if total:
+            Message.objects.filter(pk=pk).update(recipient_count=total, sent_count=sent)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0006_messageopen_time_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='recipient_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sent_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_recipients, migrations.RunPython.noop),
+    ]
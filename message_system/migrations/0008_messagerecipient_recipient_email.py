@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:14
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_contact_emails(apps, schema_editor):
+    Contact = apps.get_model('message_system', 'Contact')
+    MessageRecipient = apps.get_model('message_system', 'MessageRecipient')
+    MessageRecipient.objects.update(
+        recipient_email=Subquery(Contact.objects.filter(pk=OuterRef('contact_id')).values('email')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0007_message_recipient_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagerecipient',
+            name='recipient_email',
+            field=models.EmailField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(copy_contact_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:40
+
+from django.db import migrations
+
+# SQL is inlined so later edits to message_system/search.py can't change
+# what this migration does
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE message_system_contact_search USING fts5("
+    "email, first_name, last_name, company, tags, "
+    "content='message_system_contact', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER message_system_contact_search_ai AFTER INSERT ON message_system_contact BEGIN "
+    "INSERT INTO message_system_contact_search(rowid, email, first_name, last_name, company, tags) "
+    "VALUES (new.id, new.email, new.first_name, new.last_name, new.company, new.tags); END",
+    "CREATE TRIGGER message_system_contact_search_ad AFTER DELETE ON message_system_contact BEGIN "
+    "INSERT INTO message_system_contact_search(message_system_contact_search, rowid, email, first_name, last_name, company, tags) "
+    "VALUES ('delete', old.id, old.email, old.first_name, old.last_name, old.company, old.tags); END",
+    "CREATE TRIGGER message_system_contact_search_au AFTER UPDATE OF email, first_name, last_name, company, tags "
+    "ON message_system_contact BEGIN "
+    "INSERT INTO message_system_contact_search(message_system_contact_search, rowid, email, first_name, last_name, company, tags) "
+    "VALUES ('delete', old.id, old.email, old.first_name, old.last_name, old.company, old.tags); "
+    "INSERT INTO message_system_contact_search(rowid, email, first_name, last_name, company, tags) "
+    "VALUES (new.id, new.email, new.first_name, new.last_name, new.company, new.tags); END",
+    "INSERT INTO message_system_contact_search(message_system_contact_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS message_system_contact_search_ai",
+    "DROP TRIGGER IF EXISTS message_system_contact_search_ad",
+    "DROP TRIGGER IF EXISTS message_system_contact_search_au",
+    "DROP TABLE IF EXISTS message_system_contact_search",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; other backends keep the icontains search
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("message_system", "0008_messagerecipient_recipient_email"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
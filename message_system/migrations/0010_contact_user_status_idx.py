@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-15 23:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0009_contact_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='message_sys_user_id_d9f142_idx',
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'status', 'is_active'], name='contact_user_status_idx'),
+        ),
+    ]
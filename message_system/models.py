@@ -1,12 +1,26 @@
 # message_system/models.py
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models.constants import OnConflict
 from campaigns.models import Campaign
 from smtp.models import SMTPAccount
+from message_system.buffer import buffer_open
 import uuid
 import hashlib
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+
+logger = logging.getLogger(__name__)
 
 
 STATUS_CHOICES = [
@@ -18,18 +32,93 @@ STATUS_CHOICES = [
 ]
 
 
+# blake2b keys are limited to 64 bytes, so derive a fixed-size key from the salt
+_IP_HASH_KEY = hashlib.sha256(
+    getattr(settings, "IP_HASH_SALT", settings.SECRET_KEY).encode("utf-8")
+).digest()
+
+
+@lru_cache(maxsize=1 << 16)
+def hash_ip(raw_ip):
+    """
+    Keyed 16-byte blake2b digest of an IP (32 hex chars), shared by opens
+    and clicks (tracking.models). Opens and clicks repeat from the same
+    addresses (corporate NATs, mobile carriers), so recent IPs are cached.
+    Rows written before this used unkeyed sha256 (64 hex chars); ip_hash
+    keeps max_length=64 so both coexist.
+    """
+    return hashlib.blake2b(raw_ip.encode("utf-8"), digest_size=16, key=_IP_HASH_KEY).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def coarse_user_agent(user_agent):
+    """
+    Browser family kept for opens and clicks: the User-Agent up to its
+    first "/", at most 50 chars. A handful of UA strings cover most hits,
+    so results are cached.
+    """
+    return user_agent.partition("/")[0][:50]
+
+
+def is_repeat_open(message_uuid, ip_hash, recipient_id=None):
+    """
+    Whether this (message, recipient, IP) already opened within
+    OPEN_DEDUP_WINDOW seconds. Prefetchers and mail-client retries refetch
+    the pixel many times; only the first hit in the window is recorded.
+    Keying on the recipient keeps different recipients behind one NAT or
+    proxy apart. The cache.add() claim is atomic on shared backends
+    (Redis), so this holds across processes there. Opens without an IP are
+    never deduplicated.
+    """
+    window = getattr(settings, "OPEN_DEDUP_WINDOW", 60)
+    if not ip_hash or not window:
+        return False
+    return not cache.add(f"mo:{message_uuid}:{recipient_id or ''}:{ip_hash}", 1, window)
+
+
+def update_row(instance, **fields):
+    """
+    Write fields straight to the instance's row with one UPDATE, bumping
+    updated_at, and mirror them onto the instance. Skips save() and its
+    signals, so only use it for models nothing listens to.
+    """
+    fields.setdefault('updated_at', timezone.now())
+    type(instance)._default_manager.filter(pk=instance.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(instance, name, value)
+
+
+# Optional CSV columns copied onto imported contacts
+CSV_IMPORT_FIELDS = ('first_name', 'last_name', 'phone', 'company', 'notes')
+
+
 # -------------------- Contact Manager --------------------
-class ContactManager(models.Manager):
+class ContactQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Delete the contacts and recount the messages their recipients
+        CASCADE away from, so campaigns can still reach sent >= total.
+        """
+        message_ids = list(
+            MessageRecipient.objects.filter(contact__in=self)
+            .values_list('message_id', flat=True).distinct()
+        )
+        with transaction.atomic(using=self.db):
+            result = super().delete()
+            Message.objects.refresh_recipient_counts(message_ids)
+        return result
+
+
+class ContactManager(models.Manager.from_queryset(ContactQuerySet)):
     def create_contact(self, user, email, first_name="", last_name="", **extra_fields):
         """
         Create a contact with validation for email uniqueness per user.
+        Uniqueness is left to the unique_email_per_user constraint rather
+        than checked with a SELECT (or full_clean()) before the INSERT.
         """
         # Normalize email
         email = email.lower().strip()
-        
-        # Check if contact already exists for this user
-        if self.filter(user=user, email=email).exists():
-            raise ValidationError(f"Contact with email {email} already exists.")
+        validate_email(email)
         
         contact = self.model(
             user=user,
@@ -38,48 +127,134 @@ class ContactManager(models.Manager):
             last_name=last_name.strip(),
             **extra_fields
         )
-        contact.full_clean()
-        contact.save(using=self._db)
+        try:
+            with transaction.atomic(using=self._db):
+                contact.save(using=self._db)
+        except IntegrityError:
+            raise ValidationError(f"Contact with email {email} already exists.")
         return contact
     
-    def bulk_create_from_csv(self, user, csv_file):
+    def insert_imported(self, user, rows):
         """
-        Bulk create contacts from CSV file.
-        Returns: (success_count, error_count, errors_list)
+        Insert imported contacts with one executemany() INSERT, skipping
+        rows that conflict on (user, email).
+        `rows` are dicts of email plus CSV_IMPORT_FIELDS; every other column
+        takes its default, prepared once per call instead of per row, and no
+        model instances are built.
         """
-        import csv
-        import io
+        if not rows:
+            return
+        connection = connections[self.db]
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        template = self.model(user=user)
+        now = timezone.now()
+        defaults = {
+            field.attname: field.get_db_prep_save(
+                now if getattr(field, 'auto_now', False) else getattr(template, field.attname),
+                connection,
+            )
+            for field in fields
+        }
         
+        quote = connection.ops.quote_name
+        sql = (
+            f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+            f"{quote(self.model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"{connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)}"
+        )
+        params = [
+            [row.get(field.attname, defaults[field.attname]) for field in fields]
+            for row in rows
+        ]
+        # One transaction, so autocommit backends don't commit per row
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+    
+    def bulk_create_from_rows(self, user, rows, batch_size=1000, progress=None):
+        """
+        Bulk create contacts from an iterable of dicts keyed by column name
+        ('email' plus any of CSV_IMPORT_FIELDS); row numbers in errors count
+        from 1. Contacts are written every `batch_size` valid rows: one
+        duplicate SELECT and one INSERT per batch (see insert_imported), so
+        memory stays bounded by the batch size.
+        `progress`, if given, is called as progress(success_count, error_count)
+        after each batch.
+        Returns: (success_count, error_count, errors_list)
+        """
         success_count = 0
-        error_count = 0
-        errors = []
+        failures = []
+        seen = set()
+        pending = {}
         
-        # Read CSV
-        csv_content = csv_file.read().decode('utf-8')
-        reader = csv.DictReader(io.StringIO(csv_content))
+        def flush():
+            nonlocal success_count
+            existing = set(
+                self.filter(user=user, email__in=list(pending)).values_list('email', flat=True)
+            )
+            for email in existing:
+                row_num, _ = pending.pop(email)
+                failures.append((row_num, f"Contact with email {email} already exists."))
+            self.insert_imported(user, [values for _, values in pending.values()])
+            success_count += len(pending)
+            pending.clear()
+            if progress:
+                progress(success_count, len(failures))
         
-        for row_num, row in enumerate(reader, 1):
+        for row_num, row in enumerate(rows, 1):
             try:
-                email = row.get('email', '').strip()
+                email = (row.get('email') or '').lower().strip()
                 if not email:
                     raise ValidationError("Email is required")
+                validate_email(email)
+                if email in seen:
+                    raise ValidationError(f"Contact with email {email} already exists.")
                 
-                # Create contact
-                self.create_contact(
-                    user=user,
-                    email=email,
-                    first_name=row.get('first_name', '').strip(),
-                    last_name=row.get('last_name', '').strip(),
-                    phone=row.get('phone', '').strip(),
-                    company=row.get('company', '').strip(),
-                    notes=row.get('notes', '').strip()
-                )
-                success_count += 1
-            except Exception as e:
-                error_count += 1
-                errors.append(f"Row {row_num}: {str(e)}")
+                values = {
+                    field: (row.get(field) or '').strip()
+                    for field in CSV_IMPORT_FIELDS
+                }
+                for field, value in values.items():
+                    max_length = self.model._meta.get_field(field).max_length
+                    if max_length and len(value) > max_length:
+                        raise ValidationError(f"{field} must be at most {max_length} characters.")
+            except ValidationError as e:
+                failures.append((row_num, '; '.join(e.messages)))
+                continue
+            
+            seen.add(email)
+            pending[email] = (row_num, {'email': email, **values})
+            if len(pending) >= batch_size:
+                flush()
+        
+        if pending:
+            flush()
+        
+        errors = [f"Row {row_num}: {message}" for row_num, message in sorted(failures)]
+        return success_count, len(errors), errors
+
+    def bulk_create_from_csv(self, user, csv_file, batch_size=1000, progress=None):
+        """
+        Bulk create contacts from CSV file.
+        The file is parsed as a stream and handed row by row to
+        bulk_create_from_rows. Returns: (success_count, error_count, errors_list)
+        """
+        import csv
+        import io
         
-        return success_count, error_count, errors
+        # Stream rows from the upload; detach afterwards so the wrapper
+        # never closes the caller's file
+        text = io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.DictReader(text)
+            # Match headers the way ContactImportForm checks them ("Email ")
+            if reader.fieldnames:
+                reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+            return self.bulk_create_from_rows(
+                user, reader, batch_size=batch_size, progress=progress
+            )
+        finally:
+            text.detach()
 
 
 # -------------------- Contact Model --------------------
@@ -108,7 +283,8 @@ class Contact(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="subscribed")
     is_active = models.BooleanField(default=True)
     
-    # Tags for segmentation (comma-separated)
+    # Tags for segmentation (comma-separated). Indexed per tag in ContactTag,
+    # kept in sync by save(); writes that bypass save() must call sync_tag_index()
     tags = models.CharField(max_length=500, blank=True)
     
     # Groups for segmentation (ManyToMany to ContactGroup)
@@ -141,7 +317,7 @@ class Contact(models.Model):
             )
         ]
         indexes = [
-            models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', 'status', 'is_active'], name='contact_user_status_idx'),
             models.Index(fields=['user', 'is_active']),
             models.Index(fields=['email']),
             models.Index(fields=['created_at']),
@@ -150,6 +326,31 @@ class Contact(models.Model):
     def __str__(self):
         return f"{self.email} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored tags so save() only re-indexes when they change
+        instance._loaded_tags = instance.__dict__.get('tags')
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'tags' not in update_fields:
+            return
+        loaded_tags = '' if adding else getattr(self, '_loaded_tags', None)
+        if self.tags != loaded_tags:
+            self.sync_tag_index()
+
+    def delete(self, *args, **kwargs):
+        # Same recount as ContactQuerySet.delete()
+        message_ids = list(self.message_recipients.values_list('message_id', flat=True))
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Contact, instance=self)):
+            result = super().delete(*args, **kwargs)
+            Message.objects.refresh_recipient_counts(message_ids)
+        return result
+
     def get_full_name(self):
         """Get full name or email if no name provided."""
         if self.first_name or self.last_name:
@@ -158,45 +359,46 @@ class Contact(models.Model):
 
     def unsubscribe(self):
         """Mark contact as unsubscribed."""
-        self.status = "unsubscribed"
-        self.is_active = False
-        self.unsubscribed_at = timezone.now()
-        self.save(update_fields=['status', 'is_active', 'unsubscribed_at', 'updated_at'])
+        update_row(self, status="unsubscribed", is_active=False, unsubscribed_at=timezone.now())
 
     def resubscribe(self):
         """Resubscribe a contact."""
-        self.status = "subscribed"
-        self.is_active = True
-        self.unsubscribed_at = None
-        self.save(update_fields=['status', 'is_active', 'unsubscribed_at', 'updated_at'])
+        update_row(self, status="subscribed", is_active=True, unsubscribed_at=None)
 
     def mark_bounced(self):
         """Mark contact as bounced."""
-        self.status = "bounced"
-        self.is_active = False
-        self.save(update_fields=['status', 'is_active', 'updated_at'])
+        update_row(self, status="bounced", is_active=False)
 
     def mark_complaint(self):
         """Mark contact as complaint (spam report)."""
-        self.status = "complaint"
-        self.is_active = False
-        self.save(update_fields=['status', 'is_active', 'updated_at'])
+        update_row(self, status="complaint", is_active=False)
 
     def add_tag(self, tag):
         """Add a tag to contact."""
         tags = self.get_tags()
         if tag not in tags:
             tags.append(tag)
-            self.tags = ','.join(tags)
-            self.save(update_fields=['tags', 'updated_at'])
+            # Write the column and the one new index row directly instead of
+            # save() diffing the whole ContactTag set
+            with transaction.atomic():
+                update_row(self, tags=','.join(tags))
+                ContactTag.objects.bulk_create(
+                    [ContactTag(contact=self, name=normalize_tag(tag))], ignore_conflicts=True
+                )
+            self._loaded_tags = self.tags
 
     def remove_tag(self, tag):
         """Remove a tag from contact."""
         tags = self.get_tags()
         if tag in tags:
             tags.remove(tag)
-            self.tags = ','.join(tags)
-            self.save(update_fields=['tags', 'updated_at'])
+            name = normalize_tag(tag)
+            with transaction.atomic():
+                update_row(self, tags=','.join(tags))
+                # Another spelling of the tag may still map to the same index row
+                if name not in {normalize_tag(t) for t in tags}:
+                    self.tag_entries.filter(name=name).delete()
+            self._loaded_tags = self.tags
 
     def get_tags(self):
         """Get list of tags."""
@@ -204,10 +406,56 @@ class Contact(models.Model):
             return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
         return []
 
+    def sync_tag_index(self):
+        """Make this contact's ContactTag rows match its tags."""
+        names = {normalize_tag(tag) for tag in self.get_tags()}
+        indexed = set(self.tag_entries.values_list('name', flat=True))
+        if indexed - names:
+            self.tag_entries.filter(name__in=indexed - names).delete()
+        if names - indexed:
+            ContactTag.objects.bulk_create(
+                [ContactTag(contact=self, name=name) for name in names - indexed],
+                ignore_conflicts=True,
+            )
+        self._loaded_tags = self.tags
+
     def update_last_contacted(self):
         """Update last contacted timestamp."""
-        self.last_contacted_at = timezone.now()
-        self.save(update_fields=['last_contacted_at', 'updated_at'])
+        update_row(self, last_contacted_at=timezone.now())
+
+
+def normalize_tag(tag):
+    """Form a tag is indexed and matched in: stripped, lowercased, bounded length."""
+    return tag.strip().lower()[:100]
+
+
+# -------------------- ContactTag Model --------------------
+class ContactTag(models.Model):
+    """
+    One row per tag on a contact: an inverted index over Contact.tags, so
+    tag filters are indexed lookups on (name, contact) instead of LIKE
+    scans over every contact.
+    """
+    contact = models.ForeignKey(
+        Contact,
+        on_delete=models.CASCADE,
+        related_name="tag_entries"
+    )
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['contact', 'name'],
+                name='unique_tag_per_contact'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['name', 'contact']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.contact_id})"
 
 
 # -------------------- Message Manager --------------------
@@ -215,10 +463,11 @@ class MessageManager(models.Manager):
     def create_message(self, campaign, subject, body_plain="", body_html="", sender_smtp=None):
         if not campaign:
             raise ValidationError("Campaign is required to create a message.")
+        if not subject:
+            raise ValidationError("Subject is required to create a message.")
 
         message = self.model(
             campaign=campaign,
-            uuid=str(uuid.uuid4()),
             subject=subject,
             body_plain=body_plain,
             body_html=body_html,
@@ -226,10 +475,24 @@ class MessageManager(models.Manager):
             status="draft",
             created_at=timezone.now(),
         )
-        message.full_clean()
+        # No full_clean(): the campaign was checked above and the uuid default
+        # is freshly generated, so its SELECTs would only repeat DB constraints
         message.save(using=self._db)
         return message
 
+    def refresh_recipient_counts(self, message_ids):
+        """Recount recipient_count and sent_count for these messages in one UPDATE."""
+        if not message_ids:
+            return
+        recipients = MessageRecipient.objects.filter(message=OuterRef('pk')).order_by().values('message')
+        self.filter(pk__in=message_ids).update(
+            recipient_count=Coalesce(Subquery(recipients.annotate(n=Count('id')).values('n')), Value(0)),
+            sent_count=Coalesce(
+                Subquery(recipients.filter(sent_at__isnull=False).annotate(n=Count('id')).values('n')),
+                Value(0),
+            ),
+        )
+
 
 # -------------------- Message Model --------------------
 class Message(models.Model):
@@ -238,7 +501,7 @@ class Message(models.Model):
         on_delete=models.CASCADE,
         related_name="messages"
     )
-    uuid = models.CharField(max_length=36, unique=True)
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     subject = models.CharField(max_length=255)
     body_plain = models.TextField(blank=True)
     body_html = models.TextField(blank=True)
@@ -255,6 +518,12 @@ class Message(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized recipient counters, so listings don't COUNT per message.
+    # Kept current by add_recipient(s) and MessageRecipient.mark_sent();
+    # refresh_recipient_counts() recounts after other bulk changes.
+    recipient_count = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+
     objects = MessageManager()
 
     # -------------------- State transitions --------------------
@@ -277,23 +546,80 @@ class Message(models.Model):
     
     def add_recipient(self, contact):
         """Add a recipient to this message."""
-        return MessageRecipient.objects.create(message=self, contact=contact)
+        recipient = MessageRecipient.objects.create(message=self, contact=contact, recipient_email=contact.email)
+        Message.objects.filter(pk=self.pk).update(recipient_count=F('recipient_count') + 1)
+        self.recipient_count += 1
+        return recipient
     
-    def add_recipients(self, contacts):
-        """Add multiple recipients to this message."""
-        recipients = []
-        for contact in contacts:
-            recipients.append(MessageRecipient(message=self, contact=contact))
-        MessageRecipient.objects.bulk_create(recipients)
-        return recipients
+    def add_recipients(self, contacts, batch_size=5000):
+        """
+        Add multiple recipients to this message.
+        Takes (contact id, email) pairs (e.g. a values_list('id', 'email')
+        queryset) so Contact rows are never loaded; rows are inserted
+        `batch_size` at a time and contacts that are already recipients are
+        skipped. Returns the number of pairs given.
+        """
+        total = 0
+        with self.recipient_writer(batch_size) as add:
+            for contact_id, email in contacts:
+                add(contact_id, email)
+                total += 1
+        return total
+
+    @contextmanager
+    def recipient_writer(self, batch_size=5000):
+        """
+        Buffered alternative to calling add_recipient() in a loop:
+
+            with message.recipient_writer() as add:
+                for contact_id, email in pairs:
+                    add(contact_id, email)
+
+        Rows are bulk-inserted every `batch_size` adds and when the block
+        exits (existing recipients are skipped), and the counters are
+        recounted once at the end. If the block raises, rows already
+        flushed stay and the rest are dropped.
+        """
+        pending = []
+        written = 0
+
+        def flush():
+            nonlocal written
+            MessageRecipient.objects.bulk_create(pending, ignore_conflicts=True)
+            written += len(pending)
+            pending.clear()
+
+        def add(contact_id, email):
+            pending.append(MessageRecipient(message_id=self.id, contact_id=contact_id, recipient_email=email))
+            if len(pending) >= batch_size:
+                flush()
+
+        yield add
+        if pending:
+            flush()
+        # ignore_conflicts can't report how many rows were new, so recount once
+        if written:
+            self.refresh_recipient_counts()
+    
+    def refresh_recipient_counts(self):
+        """Recount recipient_count and sent_count from the recipients table."""
+        counts = self.recipients.aggregate(
+            total=Count('id'),
+            sent=Count('id', filter=Q(sent_at__isnull=False)),
+        )
+        self.recipient_count = counts['total']
+        self.sent_count = counts['sent']
+        Message.objects.filter(pk=self.pk).update(
+            recipient_count=self.recipient_count, sent_count=self.sent_count
+        )
     
     def get_recipient_count(self):
         """Get number of recipients for this message."""
-        return self.recipients.count()
+        return self.recipient_count
     
     def get_sent_count(self):
-        """Get number of recipients who have received this message."""
-        return self.recipients.filter(status="sent").count()
+        """Get number of recipients this message has been sent to."""
+        return self.sent_count
 
 
 # -------------------- MessageRecipient Manager --------------------
@@ -327,6 +653,9 @@ class MessageRecipient(models.Model):
         on_delete=models.CASCADE,
         related_name="message_recipients"
     )
+    # Address the message went to, snapshotted when the recipient is added;
+    # displays and exports read it without joining Contact
+    recipient_email = models.EmailField(max_length=255, blank=True)
     
     # Delivery tracking
     sent_at = models.DateTimeField(null=True, blank=True)
@@ -357,59 +686,72 @@ class MessageRecipient(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.contact.email} → {self.message.subject} ({self.status})"
+        return f"{self.recipient_email} → {self.message.subject} ({self.status})"
+
+    def save(self, *args, **kwargs):
+        if not self.recipient_email and self.contact_id:
+            self.recipient_email = self.contact.email
+        super().save(*args, **kwargs)
     
     def mark_sent(self):
         """Mark as sent."""
-        self.status = "sent"
-        self.sent_at = timezone.now()
-        self.save(update_fields=['status', 'sent_at', 'updated_at'])
+        first_send = self.sent_at is None
+        update_row(self, status="sent", sent_at=timezone.now())
+        if first_send:
+            Message.objects.filter(pk=self.message_id).update(sent_count=F('sent_count') + 1)
     
     def mark_delivered(self):
         """Mark as delivered."""
-        self.status = "delivered"
-        self.delivered_at = timezone.now()
-        self.save(update_fields=['status', 'delivered_at', 'updated_at'])
+        update_row(self, status="delivered", delivered_at=timezone.now())
     
     def mark_opened(self):
         """Mark as opened."""
-        self.status = "opened"
-        self.opened_at = timezone.now()
-        self.save(update_fields=['status', 'opened_at', 'updated_at'])
+        update_row(self, status="opened", opened_at=timezone.now())
     
     def mark_clicked(self):
         """Mark as clicked."""
-        self.status = "clicked"
-        self.clicked_at = timezone.now()
-        self.save(update_fields=['status', 'clicked_at', 'updated_at'])
+        update_row(self, status="clicked", clicked_at=timezone.now())
     
     def mark_bounced(self):
         """Mark as bounced."""
-        self.status = "bounced"
-        self.save(update_fields=['status', 'updated_at'])
+        update_row(self, status="bounced")
     
     def mark_complaint(self):
         """Mark as complaint."""
-        self.status = "complaint"
-        self.save(update_fields=['status', 'updated_at'])
+        update_row(self, status="complaint")
     
     def mark_failed(self, error_message=""):
         """Mark as failed."""
-        self.status = "failed"
-        self.error_message = error_message
-        self.retry_count += 1
-        self.save(update_fields=['status', 'error_message', 'retry_count', 'updated_at'])
+        # Increment in SQL so concurrent workers failing the same recipient
+        # don't overwrite each other's count
+        retry_count = self.retry_count
+        update_row(self, status="failed", error_message=error_message, retry_count=F('retry_count') + 1)
+        self.retry_count = retry_count + 1
 
 
 # -------------------- MessageOpen Manager --------------------
-class MessageOpenManager(models.Manager):
-    def record_open(self, message, contact=None, raw_ip=None, user_agent_family="", beacon_uuid=None):
+class MessageOpenQuerySet(models.QuerySet):
+    def with_display(self):
+        """Join what __str__ and admin listings read, so rendering opens costs one query."""
+        return self.select_related('recipient', 'message')
+
+
+class MessageOpenManager(models.Manager.from_queryset(MessageOpenQuerySet)):
+    def record_open(self, message, contact=None, raw_ip=None, user_agent_family="", beacon_uuid=None, buffered=False):
         """
         Canonical entry point for recording opens.
         All privacy rules enforced here.
+        With `buffered=True` the open is queued for a batched insert
+        (message_system/buffer.py) and returned unsaved; the recipient is
+        marked opened when the buffer flushes.
+        Returns None for a repeat hit from the same IP (is_repeat_open).
         """
         if beacon_uuid is None:
-            beacon_uuid = message.uuid
+            beacon_uuid = str(message.uuid)
+
+        ip_hash = None
+        if raw_ip:
+            ip_hash = hash_ip(raw_ip)
         
         # Try to find the recipient if contact is provided
         recipient = None
@@ -418,19 +760,14 @@ class MessageOpenManager(models.Manager):
                 message=message, 
                 contact=contact
             ).first()
-        
-        ip_hash = None
-        if raw_ip:
-            ip_hash = hashlib.sha256(raw_ip.encode("utf-8")).hexdigest()
+
+        if is_repeat_open(message.uuid, ip_hash, recipient.pk if recipient else None):
+            return None
 
         if user_agent_family:
-            user_agent_family = user_agent_family.split("/")[0][:50]
+            user_agent_family = coarse_user_agent(user_agent_family)
         
-        # Update recipient status if found
-        if recipient:
-            recipient.mark_opened()
-
-        return self.create(
+        message_open = self.model(
             message=message,
             recipient=recipient,
             beacon_uuid=beacon_uuid,
@@ -438,6 +775,94 @@ class MessageOpenManager(models.Manager):
             user_agent_family=user_agent_family,
             opened_at=timezone.now(),
         )
+        if buffered:
+            buffer_open(message_open)
+            return message_open
+
+        # Update recipient status if found
+        if recipient:
+            recipient.mark_opened()
+
+        message_open.save(using=self._db)
+        return message_open
+
+    def record_opens(self, message, events):
+        """
+        Record a burst of opens for one message in a fixed number of queries.
+        `events` is an iterable of dicts with optional 'contact', 'raw_ip' and
+        'user_agent_family' keys, filtered by the same privacy and dedup rules
+        as record_open. Returns the list of MessageOpen rows written.
+        """
+        beacon_uuid = str(message.uuid)
+        now = timezone.now()
+        events = list(events)
+        contact_ids = {
+            getattr(e['contact'], 'pk', e['contact']) for e in events if e.get('contact')
+        }
+        recipients = {}
+        if contact_ids:
+            recipients = {
+                r.contact_id: r
+                for r in MessageRecipient.objects.filter(message=message, contact_id__in=contact_ids)
+            }
+
+        opens = []
+        for event in events:
+            raw_ip = event.get('raw_ip')
+            ip_hash = hash_ip(raw_ip) if raw_ip else None
+            contact = event.get('contact')
+            recipient = recipients.get(getattr(contact, 'pk', contact))
+            if is_repeat_open(message.uuid, ip_hash, recipient.pk if recipient else None):
+                continue
+            user_agent_family = event.get('user_agent_family') or ""
+            opens.append(self.model(
+                message=message,
+                recipient=recipient,
+                beacon_uuid=beacon_uuid,
+                ip_hash=ip_hash,
+                user_agent_family=coarse_user_agent(user_agent_family) if user_agent_family else "",
+                opened_at=now,
+            ))
+        return self.write_batch(opens)
+
+    def write_batch(self, opens):
+        """
+        Insert unsaved opens with bulk_create. bulk_create sends no post_save,
+        so the linked recipients are marked opened in one UPDATE and a
+        debounced analytics recompute is queued per campaign instead.
+        Opens carrying a bare recipient_id (the beacon passes its query
+        parameter through unchecked) keep it only if that recipient belongs
+        to the open's message.
+        """
+        if not opens:
+            return opens
+        from analytics.tasks import schedule_analytics_recompute
+
+        unchecked = [
+            o for o in opens
+            if o.recipient_id and not self.model.recipient.is_cached(o)
+        ]
+        if unchecked:
+            owners = dict(
+                MessageRecipient.objects.filter(
+                    pk__in={o.recipient_id for o in unchecked}
+                ).values_list('pk', 'message_id')
+            )
+            for o in unchecked:
+                if owners.get(o.recipient_id) != o.message_id:
+                    logger.warning(f"Recipient {o.recipient_id} not found for message {o.message_id}")
+                    o.recipient_id = None
+
+        self.bulk_create(opens, batch_size=500)
+        recipient_ids = {o.recipient_id for o in opens if o.recipient_id}
+        if recipient_ids:
+            now = timezone.now()
+            MessageRecipient.objects.filter(pk__in=recipient_ids).update(
+                status="opened", opened_at=now, updated_at=now
+            )
+        for campaign_id in {o.message.campaign_id for o in opens}:
+            schedule_analytics_recompute(campaign_id)
+        return opens
 
 
 # -------------------- MessageOpen Model --------------------
@@ -462,23 +887,43 @@ class MessageOpen(models.Model):
     objects = MessageOpenManager()
 
     class Meta:
+        # No standalone opened_at index: every beacon INSERT would land on its
+        # rightmost page. Time-ordered reads are scoped to a message anyway.
         indexes = [
             models.Index(fields=["beacon_uuid"]),
-            models.Index(fields=["opened_at"]),
+            models.Index(fields=["message", "-opened_at"], name="open_msg_time_idx"),
             models.Index(fields=["message", "recipient"]),
         ]
 
     def save(self, *args, **kwargs):
         # Defensive layer: ensure UA is coarse even if misused
         if self.user_agent_family:
-            self.user_agent_family = self.user_agent_family.split("/")[0][:50]
+            self.user_agent_family = coarse_user_agent(self.user_agent_family)
         super().save(*args, **kwargs)
 
     def __str__(self):
-        recipient_email = self.recipient.contact.email if self.recipient else "Unknown"
+        recipient_email = self.recipient.recipient_email if self.recipient else "Unknown"
         return f"Open for {recipient_email} at {self.opened_at}"
 
 
+# -------------------- ContactGroup Manager --------------------
+class ContactGroupManager(models.Manager):
+    @staticmethod
+    def options_cache_key(user_id):
+        return f"contactgroups:{user_id}"
+
+    def options_for(self, user):
+        """
+        A user's groups (id and name only) for filter/bulk-action dropdowns.
+        Cached per user; ContactGroup.save() and delete() drop the entry.
+        """
+        return cache.get_or_set(
+            self.options_cache_key(user.pk),
+            lambda: list(self.filter(user=user).only('id', 'name')),
+            getattr(settings, "CONTACT_GROUP_OPTIONS_TTL", 300),
+        )
+
+
 # -------------------- ContactGroup Model --------------------
 class ContactGroup(models.Model):
     """
@@ -503,6 +948,8 @@ class ContactGroup(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ContactGroupManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -514,11 +961,18 @@ class ContactGroup(models.Model):
     def __str__(self):
         return f"{self.name} ({'Dynamic' if self.is_dynamic else 'Static'})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(ContactGroupManager.options_cache_key(self.user_id))
+
+    def delete(self, *args, **kwargs):
+        cache.delete(ContactGroupManager.options_cache_key(self.user_id))
+        return super().delete(*args, **kwargs)
+
     def get_contacts(self):
         """Get contacts in this group."""
         if self.is_dynamic:
             # Apply filter criteria to get contacts dynamically
-            from django.db.models import Q
             query = Q(user=self.user, is_active=True)
             
             # Apply filters from criteria
@@ -528,12 +982,16 @@ class ContactGroup(models.Model):
                 query &= Q(status=criteria['status'])
             
             if 'tags' in criteria and criteria['tags']:
-                # Filter by tags (contacts with any of the tags)
+                # Contacts with any of the tags: one IN lookup on the ContactTag
+                # (name, contact) index, scoped to this user's contacts.
+                # Criteria may hold a list or a comma-separated string.
                 tags = criteria['tags']
-                tag_query = Q()
-                for tag in tags:
-                    tag_query |= Q(tags__icontains=tag)
-                query &= tag_query
+                if isinstance(tags, str):
+                    tags = tags.split(',')
+                names = {normalize_tag(tag) for tag in tags if tag.strip()}
+                query &= Q(id__in=ContactTag.objects.filter(
+                    name__in=names, contact__user=self.user
+                ).values('contact_id'))
             
             if 'created_after' in criteria:
                 query &= Q(created_at__gte=criteria['created_after'])
@@ -546,15 +1004,23 @@ class ContactGroup(models.Model):
     def update_dynamic_members(self):
         """Update dynamic group membership based on criteria."""
         if self.is_dynamic:
-            # Clear existing static memberships
-            self.contacts.clear()
-            
-            # Get contacts matching criteria
-            matching_contacts = self.get_contacts()
-            
-            # Add them to the group
-            for contact in matching_contacts:
-                self.contacts.add(contact)
+            # Rewrite the through table directly: one DELETE and batched
+            # INSERTs instead of one INSERT per matching contact. Matching
+            # ids are streamed 5000 at a time; no Contact is instantiated.
+            Membership = Contact.groups.through
+            contact_ids = self.get_contacts().values_list('id', flat=True).iterator(chunk_size=5000)
+            total = 0
+            with transaction.atomic():
+                Membership.objects.filter(contactgroup=self).delete()
+                while True:
+                    batch = [
+                        Membership(contactgroup_id=self.id, contact_id=contact_id)
+                        for contact_id in islice(contact_ids, 5000)
+                    ]
+                    if not batch:
+                        break
+                    Membership.objects.bulk_create(batch, ignore_conflicts=True)
+                    total += len(batch)
             
-            return matching_contacts.count()
+            return total
         return 0
\ No newline at end of file
@@ -0,0 +1,132 @@
+# message_system/search.py
+"""
+Indexed substring search over contacts.
+
+On SQLite the searchable columns are mirrored into an FTS5 table using the
+trigram tokenizer (the SQLite counterpart of a pg_trgm GIN index), kept in
+sync by triggers on message_system_contact. A quoted trigram MATCH is a
+case-insensitive substring match, so it returns the same rows as the
+icontains chain it replaces without scanning every contact.
+
+Terms shorter than three characters can't be matched by trigrams, and
+other backends (or a database migrated before the index existed) have no
+index, so those fall back to the icontains chain.
+"""
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = "message_system_contact_search"
+SEARCH_COLUMNS = ("email", "first_name", "last_name", "company", "tags")
+MIN_INDEXED_LENGTH = 3
+
+# alias -> whether the index table and its triggers exist; checked once
+# per process (and again after every migrate, see repair_search_index)
+_index_ready = {}
+
+_COLUMNS = ", ".join(SEARCH_COLUMNS)
+_DELETE_OLD = (
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_COLUMNS}) "
+    f"VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in SEARCH_COLUMNS)});"
+)
+_INSERT_NEW = (
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_COLUMNS}) "
+    f"VALUES (new.id, {', '.join(f'new.{c}' for c in SEARCH_COLUMNS)});"
+)
+# Status/activity updates don't touch the index
+SEARCH_TRIGGERS = {
+    f"{SEARCH_TABLE}_ai": f"AFTER INSERT ON message_system_contact BEGIN {_INSERT_NEW} END",
+    f"{SEARCH_TABLE}_ad": f"AFTER DELETE ON message_system_contact BEGIN {_DELETE_OLD} END",
+    f"{SEARCH_TABLE}_au": (
+        f"AFTER UPDATE OF {_COLUMNS} ON message_system_contact "
+        f"BEGIN {_DELETE_OLD} {_INSERT_NEW} END"
+    ),
+}
+
+
+def _existing(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name = %s OR tbl_name = 'message_system_contact'",
+            [SEARCH_TABLE],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def install_search_index(connection):
+    """Create, sync-trigger and fill the FTS5 table (SQLite only)."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            f"{_COLUMNS}, content='message_system_contact', content_rowid='id', "
+            f"tokenize='trigram')"
+        )
+    repair_search_index(connection)
+
+
+def repair_search_index(connection):
+    """
+    Recreate missing sync triggers and rebuild the index from the contact
+    table. SQLite drops a table's triggers whenever Django remakes it
+    (AlterField, AddField with a default), so this runs after every
+    migrate; until then has_search_index() reports the index as missing.
+    """
+    if connection.vendor != "sqlite":
+        return
+    existing = _existing(connection)
+    if SEARCH_TABLE not in existing:
+        _index_ready[connection.alias] = False
+        return
+    missing = [name for name in SEARCH_TRIGGERS if name not in existing]
+    if missing:
+        # Writes made while a trigger was missing never reached the index
+        with connection.cursor() as cursor:
+            for name in missing:
+                cursor.execute(f"CREATE TRIGGER {name} {SEARCH_TRIGGERS[name]}")
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    _index_ready[connection.alias] = True
+
+
+def drop_search_index(connection):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name in SEARCH_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    _index_ready[connection.alias] = False
+
+
+def has_search_index(connection):
+    """Whether the FTS table and all of its sync triggers exist."""
+    if connection.alias not in _index_ready:
+        _index_ready[connection.alias] = (
+            connection.vendor == "sqlite"
+            and {SEARCH_TABLE, *SEARCH_TRIGGERS} <= _existing(connection)
+        )
+    return _index_ready[connection.alias]
+
+
+def repair_search_index_after_migrate(sender, using, **kwargs):
+    """post_migrate receiver (MessageSystemConfig.ready)."""
+    repair_search_index(connections[using])
+
+
+def search_contacts(queryset, term, fields=SEARCH_COLUMNS):
+    """Filter a Contact queryset to rows containing term in any of fields."""
+    connection = connections[queryset.db]
+    if len(term) >= MIN_INDEXED_LENGTH and has_search_index(connection):
+        # Column filter + quoted phrase: substring match on those columns only
+        phrase = '"' + term.replace('"', '""') + '"'
+        match = "{" + " ".join(fields) + "} : " + phrase
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            (match,),
+        ))
+
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": term})
+    return queryset.filter(condition)
@@ -0,0 +1,54 @@
+# message_system/tasks.py
+import uuid
+
+from django.core.files.storage import default_storage
+
+from queues.models import QueueJob
+from queues.services import enqueue_job, job_handler
+from .models import Contact
+
+IMPORT_CONTACTS_JOB = "import_contacts"
+
+# Errors kept on the job for display; the full count is always reported
+IMPORT_ERRORS_KEPT = 100
+
+
+def queue_contact_import(user, csv_file):
+    """
+    Store an uploaded CSV and queue it for import by `process_jobs`, so the
+    request never waits on the import. Returns the QueueJob.
+    """
+    path = default_storage.save(f"contact_imports/{uuid.uuid4().hex}.csv", csv_file)
+    # An interrupted import is not retried; re-uploading skips the rows
+    # already imported as duplicates
+    return enqueue_job(
+        user,
+        IMPORT_CONTACTS_JOB,
+        {"path": path, "filename": csv_file.name},
+        max_retries=1,
+    )
+
+
+@job_handler(IMPORT_CONTACTS_JOB)
+def import_contacts(job):
+    """Import a stored CSV, recording progress on the job after every batch."""
+    def progress(success_count, error_count):
+        QueueJob.objects.filter(pk=job.pk).update(
+            payload={**job.payload, "progress": {"imported": success_count, "errors": error_count}}
+        )
+
+    try:
+        with default_storage.open(job.payload["path"], "rb") as csv_file:
+            success_count, error_count, errors = Contact.objects.bulk_create_from_csv(
+                user=job.user,
+                csv_file=csv_file,
+                progress=progress,
+            )
+    finally:
+        default_storage.delete(job.payload["path"])
+
+    return {
+        "success_count": success_count,
+        "error_count": error_count,
+        "errors": errors[:IMPORT_ERRORS_KEPT],
+    }
@@ -1,10 +1,11 @@
 # message_system/tests_urls.py
-from django.test import TestCase
+from django.test import SimpleTestCase
 from django.urls import reverse, resolve
 from . import views
+from .api import MessageOpenViewSet
 
 
-class URLTests(TestCase):
+class URLTests(SimpleTestCase):
     """Test that URLs resolve to correct views."""
     
     def test_contact_list_url(self):
@@ -61,4 +62,9 @@ class URLTests(TestCase):
 
     def test_beacon_url(self):
         url = reverse('message_system:message_beacon', args=['12345678-1234-5678-1234-567812345678'])
-        self.assertEqual(resolve(url).func, views.message_beacon)
\ No newline at end of file
+        self.assertEqual(resolve(url).func, views.message_beacon)
+
+    def test_message_opens_api_url(self):
+        url = reverse('message_system:message-open-list')
+        self.assertEqual(url, '/api/messages/api/message-opens/')
+        self.assertEqual(resolve(url).func.cls, MessageOpenViewSet)
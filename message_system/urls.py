@@ -1,16 +1,18 @@
 # core/message_system/urls.py
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import SimpleRouter
 from . import views
 from .api import MessageOpenViewSet
 
-router = DefaultRouter()
+# SimpleRouter: no browsable API-root view or format-suffix variants to
+# compile and walk for a single viewset
+router = SimpleRouter()
 router.register(r"message-opens", MessageOpenViewSet, basename="message-open")
 
 app_name = 'message_system'
 
 urlpatterns = [
-    # Public tracking pixel (write-only)
+    # Public tracking pixel (write-only); kept first as the hottest route
     path("t/<uuid:uuid>.png", views.message_beacon, name="message_beacon"),
     
     # ========== IMPORTANT: Public Unsubscribe (must match email link) ==========
@@ -34,6 +36,7 @@ urlpatterns = [
     
     # Contact Import & Bulk Actions
     path("contacts/import/", views.ContactImportView.as_view(), name="contact_import"),
+    path("contacts/import/<int:pk>/status/", views.ContactImportStatusView.as_view(), name="contact_import_status"),
     path("contacts/bulk-action/", views.ContactBulkActionView.as_view(), name="contact_bulk_action"),
     
     # Contact Group Management URLs
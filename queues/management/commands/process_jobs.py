@@ -0,0 +1,20 @@
+# queues/management/commands/process_jobs.py
+from django.core.management.base import BaseCommand
+from queues.services import run_pending_jobs
+from smtp.models import SMTPAccount
+
+class Command(BaseCommand):
+    help = "Process pending background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Decrypt SMTP passwords once up front instead of on the first send
+        SMTPAccount.objects.preload_passwords()
+        result = run_pending_jobs(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed={result['processed']} "
+            f"Completed={result['completed']} "
+            f"Failed={result['failed']}"
+        ))
@@ -1,5 +1,11 @@
 # queues/selectors.py
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
 from message_system.models import Message
+from queues.models import QueueJob
 
 def get_messages_ready_for_sending(limit=50):
     return (
@@ -7,3 +13,17 @@ def get_messages_ready_for_sending(limit=50):
         .filter(status="queued")
         .order_by("created_at")[:limit]
     )
+
+def get_jobs_ready_for_processing(limit=50):
+    # Also jobs whose worker died mid-run (still "processing" past the timeout)
+    now = timezone.now()
+    timed_out = now - timedelta(seconds=getattr(settings, "QUEUE_JOB_TIMEOUT", 900))
+    return (
+        QueueJob.objects
+        .filter(
+            Q(status="pending", scheduled_for__lte=now)
+            | Q(status="processing", started_at__lt=timed_out)
+        )
+        .select_related("user")
+        .order_by("-priority", "created_at")[:limit]
+    )
@@ -1,8 +1,15 @@
 # queues/services.py
+import logging
+from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
 
-from queues.selectors import get_messages_ready_for_sending
-from queues.executor import execute_message_send
+from queues.models import QueueJob
+from queues.selectors import get_messages_ready_for_sending, get_jobs_ready_for_processing
+from queues import executor
+
+logger = logging.getLogger(__name__)
 
 
 def run_message_queue(batch_size=20):
@@ -17,7 +24,7 @@ def run_message_queue(batch_size=20):
     for message in messages:
         results["processed"] += 1
 
-        success = execute_message_send(message)
+        success = executor.execute_message_send(message)
 
         if success:
             message.status = "sent"
@@ -36,3 +43,102 @@ def run_message_queue(batch_size=20):
             message.save(update_fields=["status", "retries", "updated_at"])
 
     return results
+
+
+# -------------------- Background Jobs --------------------
+# job_type -> callable(job); handlers live in each app's tasks.py
+JOB_HANDLERS = {}
+
+
+def job_handler(job_type):
+    """Register a function as the handler for a QueueJob job_type."""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def enqueue_job(user, job_type, payload, priority=0, scheduled_for=None, max_retries=None):
+    """Create a pending QueueJob to be picked up by `process_jobs`."""
+    job = QueueJob(
+        user=user,
+        job_type=job_type,
+        payload=payload,
+        priority=priority,
+        scheduled_for=scheduled_for or timezone.now(),
+    )
+    if max_retries is not None:
+        job.max_retries = max_retries
+    job.save()
+    return job
+
+
+def run_job(job):
+    """
+    Claim and execute a single job.
+    The handler's return value (if any) is stored under payload["result"].
+    Returns True when the job completed.
+    """
+    # Claim with a conditional UPDATE so concurrent workers never share a job
+    now = timezone.now()
+    if job.status == "processing":
+        # Its worker died or overran QUEUE_JOB_TIMEOUT: that attempt counts
+        # as a failure. Matching started_at lets only one worker reclaim it.
+        job.retry_count += 1
+        stuck = QueueJob.objects.filter(pk=job.pk, status="processing", started_at=job.started_at)
+        if job.retry_count >= job.max_retries:
+            stuck.update(
+                status="failed", retry_count=job.retry_count,
+                error_message="Timed out while processing",
+            )
+            return False
+        claimed = stuck.update(started_at=now, retry_count=job.retry_count)
+    else:
+        claimed = QueueJob.objects.filter(pk=job.pk, status="pending").update(
+            status="processing", started_at=now
+        )
+    if not claimed:
+        return False
+
+    handler = JOB_HANDLERS.get(job.job_type)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job type '{job.job_type}'")
+        result = handler(job)
+    except Exception as e:
+        logger.error(f"Job {job.pk} ({job.job_type}) failed: {e}")
+        job.retry_count += 1
+        job.error_message = str(e)
+        job.status = "failed" if job.retry_count >= job.max_retries or handler is None else "pending"
+        # Exponential backoff before the next attempt
+        backoff = getattr(settings, "QUEUE_JOB_RETRY_BACKOFF", 30)
+        job.scheduled_for = timezone.now() + timedelta(seconds=backoff * 2 ** (job.retry_count - 1))
+        job.save(update_fields=["status", "retry_count", "error_message", "scheduled_for"])
+        return False
+
+    if result is not None:
+        job.payload = {**job.payload, "result": result}
+    job.status = "completed"
+    job.completed_at = timezone.now()
+    job.save(update_fields=["payload", "status", "completed_at"])
+    return True
+
+
+def run_pending_jobs(batch_size=20):
+    # Import every app's tasks.py so their handlers are registered
+    autodiscover_modules("tasks")
+
+    results = {
+        "processed": 0,
+        "completed": 0,
+        "failed": 0,
+    }
+
+    for job in get_jobs_ready_for_processing(limit=batch_size):
+        results["processed"] += 1
+        if run_job(job):
+            results["completed"] += 1
+        else:
+            results["failed"] += 1
+
+    return results
@@ -1,11 +1,16 @@
 # queues/tests.py
+import io
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
 from unittest.mock import patch
 from django.core.management import call_command
 from users.models import User
 from smtp.models import SMTPAccount
 from campaigns.models import Campaign
 from message_system.models import Message
+from queues.models import QueueJob
+from queues.services import JOB_HANDLERS, enqueue_job, run_job
 
 class QueueProcessingTests(TestCase):
 
@@ -58,3 +63,72 @@ class QueueProcessingTests(TestCase):
         self.assertEqual(self.message.status, "sent")
         self.assertEqual(self.message.retries, 0)
         mock_send.assert_called_once_with(self.message)
+
+
+class JobProcessingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="jobs@test.com",
+            password="password123"
+        )
+
+    def test_job_result_is_stored_on_completion(self):
+        """
+        A handler's return value is saved on the job and the job completes.
+        """
+        with patch.dict(JOB_HANDLERS, {"echo": lambda job: job.payload["value"]}):
+            job = enqueue_job(self.user, "echo", {"value": 42})
+            self.assertTrue(run_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.payload["result"], 42)
+        self.assertIsNotNone(job.completed_at)
+
+    def test_failing_job_is_retried_then_failed(self):
+        """
+        A raising handler puts the job back to pending until max_retries.
+        """
+        def boom(job):
+            raise RuntimeError("boom")
+
+        with patch.dict(JOB_HANDLERS, {"boom": boom}):
+            job = enqueue_job(self.user, "boom", {})
+            for _ in range(job.max_retries):
+                job.refresh_from_db()
+                self.assertFalse(run_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.retry_count, job.max_retries)
+        self.assertEqual(job.error_message, "boom")
+
+    def test_job_left_processing_by_dead_worker_is_reclaimed(self):
+        """
+        A job stuck in processing past QUEUE_JOB_TIMEOUT is run again as a
+        retry, and failed once its retries are used up.
+        """
+        with patch.dict(JOB_HANDLERS, {"echo": lambda job: job.payload["value"]}):
+            job = enqueue_job(self.user, "echo", {"value": 1}, max_retries=2)
+            stale = timezone.now() - timedelta(seconds=1000)
+            QueueJob.objects.filter(pk=job.pk).update(status="processing", started_at=stale)
+
+            with self.settings(QUEUE_JOB_TIMEOUT=900):
+                call_command("process_jobs", stdout=io.StringIO())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.retry_count), ("completed", 1))
+
+            QueueJob.objects.filter(pk=job.pk).update(status="processing", started_at=stale)
+            with self.settings(QUEUE_JOB_TIMEOUT=900):
+                call_command("process_jobs", stdout=io.StringIO())
+            job.refresh_from_db()
+            self.assertEqual(job.status, "failed")
+
+        # Still inside the timeout: left alone
+        job = enqueue_job(self.user, "echo", {"value": 1})
+        QueueJob.objects.filter(pk=job.pk).update(status="processing", started_at=timezone.now())
+        with self.settings(QUEUE_JOB_TIMEOUT=900):
+            call_command("process_jobs", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "processing")
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-15 22:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smtp', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smtpaccount',
+            index=models.Index(fields=['user', 'status', 'rotation_group'], name='smtp_user_status_rot_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# smtp/mime.py
+"""
+Wire-format templates for blast sends where only the recipient changes.
+
+prebuild() serializes the message once without a To header; render()
+prepends the recipient's To header to those bytes, so each extra
+recipient costs one bytes concatenation instead of a MIME build.
+"""
+from email import policy
+from email.message import EmailMessage
+
+
+def prebuild(from_addr, subject, body, html=False):
+    """Return the CRLF-terminated headers + body of a message with no To header."""
+    msg = EmailMessage(policy=policy.SMTP)
+    msg['From'] = from_addr
+    msg['Subject'] = subject
+    msg.set_content(body, subtype='html' if html else 'plain')
+    return msg.as_bytes()
+
+
+def can_render(to_email):
+    """Whether an address can be written into the header verbatim."""
+    return to_email.isascii() and not any(c in to_email for c in "\r\n,;<>\"")
+
+
+def render(template, to_email):
+    """Wire bytes for one recipient; only call when can_render(to_email)."""
+    return b"To: " + to_email.encode("ascii") + b"\r\n" + template
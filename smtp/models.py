@@ -3,12 +3,16 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import post_save
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from core.encryption import encrypt, decrypt
+from smtp import mime as smtp_mime
+from smtp import pool as smtp_pool
 from users.models import User
-import random
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +23,18 @@ STATUS_CHOICES = [
     ("failed", "Failed"),
 ]
 
+# Decrypted passwords keyed by (pk, ciphertext): a changed password has a new
+# ciphertext, so it can never be served from a stale entry
+PASSWORD_CACHE_SIZE = 1024
+_password_cache = {}
+
+
+def _cache_password(key, password):
+    if len(_password_cache) >= PASSWORD_CACHE_SIZE:
+        _password_cache.clear()
+    _password_cache[key] = password
+
+
 class SMTPAccountManager(models.Manager):
 
     def validate_smtp(self, host, port, smtp_user, smtp_password):
@@ -51,6 +67,33 @@ class SMTPAccountManager(models.Manager):
         account.save(using=self._db)
         return account
 
+    def preload_passwords(self, user=None):
+        """
+        Decrypt the passwords of active accounts into the process cache in
+        one pass, so sends made afterwards never decrypt. Only id and
+        ciphertext are loaded. Accounts that fail to decrypt are skipped;
+        get_password() marks them failed when they are next used.
+        Returns the number of passwords loaded.
+        """
+        queryset = self.filter(status="active")
+        if user is not None:
+            queryset = queryset.filter(user=user)
+
+        loaded = 0
+        for pk, ciphertext in queryset.values_list("id", "smtp_password_encrypted").iterator():
+            key = (pk, ciphertext)
+            if key in _password_cache:
+                continue
+            try:
+                password = decrypt(ciphertext)
+            except Exception as e:
+                logger.warning(f"Skipping password preload for SMTP account {pk}: {e}")
+                continue
+            if password:
+                _cache_password(key, password)
+                loaded += 1
+        return loaded
+
     def disable_if_failed(self, smtp_account, failure_threshold=3):
         """Automatically disable account if failures exceed threshold."""
         if smtp_account.failure_count >= failure_threshold:
@@ -74,39 +117,39 @@ class SMTPAccountManager(models.Manager):
         if rotation_group:
             qs = qs.filter(rotation_group=rotation_group)
 
-        accounts = list(qs)
-        if not accounts:
+        # Let the database pick: ORDER BY RANDOM() LIMIT 1 hydrates one row
+        account = qs.order_by("?").first()
+        if account is None:
             raise ValidationError("No active SMTP accounts available for sending")
-        return random.choice(accounts)
+        return account
+
+    def deliver(self, smtp_account, to_email, subject, body, html=False):
+        """
+        Run the SMTP transaction with a given account.
+        Failure bookkeeping is left to the caller (send_email or the queued job).
+        """
+        msg = MIMEMultipart()
+        msg['From'] = smtp_account.smtp_user
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        if html:
+            msg.attach(MIMEText(body, 'html'))
+        else:
+            msg.attach(MIMEText(body, 'plain'))
+
+        # Reuses this thread's logged-in session for the account when possible
+        smtp_pool.sendmail(smtp_account, smtp_account.smtp_user, to_email, msg.as_string())
 
     def send_email(self, user, to_email, subject, body, html=False, rotation_group=None, specific_account=None):
         """
-        Send an email using a chosen SMTP.
+        Send an email using a chosen SMTP, blocking on the SMTP round-trips.
         - `html=True` sends HTML content, otherwise plain text.
+        Use smtp.tasks.queue_email to send from a background job instead.
         """
         smtp_account = self.get_smtp_for_sending(user, rotation_group, specific_account)
         try:
-            msg = MIMEMultipart()
-            msg['From'] = smtp_account.smtp_user
-            msg['To'] = to_email
-            msg['Subject'] = subject
-
-            if html:
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
-
-            server = smtplib.SMTP(smtp_account.smtp_host, smtp_account.smtp_port, timeout=10)
-            server.starttls()
-            
-            # Get password with error handling
-            password = smtp_account.get_password()
-            if not password:
-                raise ValidationError(f"SMTP account {smtp_account.smtp_user} has invalid credentials")
-                
-            server.login(smtp_account.smtp_user, password)
-            server.sendmail(smtp_account.smtp_user, to_email, msg.as_string())
-            server.quit()
+            self.deliver(smtp_account, to_email, subject, body, html)
 
             # Reset failure count on success
             smtp_account.reset_failures()
@@ -117,6 +160,64 @@ class SMTPAccountManager(models.Manager):
             smtp_account.mark_failure()
             raise
 
+    def send_bulk(self, user, outbox, rotation_group=None, batch_size=500):
+        """
+        Send many emails over pooled SMTP sessions.
+        - `outbox` is an iterable of (to_email, subject, body, html).
+        - A rotation account is picked per `batch_size` messages (and again
+          after a failure), so one session carries the whole batch.
+        Yields (to_email, success, error) per message so callers can stream.
+        """
+        smtp_account = None
+        batch_sent = 0
+        reset = set()
+        template_content = template = None
+
+        for to_email, subject, body, html in outbox:
+            if smtp_account is None or batch_sent >= batch_size:
+                try:
+                    smtp_account = self.get_smtp_for_sending(user, rotation_group)
+                except ValidationError as e:
+                    # No active account left: fail this message, try again for the next
+                    smtp_account = None
+                    yield to_email, False, str(e)
+                    continue
+                batch_sent = 0
+
+            try:
+                if smtp_mime.can_render(to_email):
+                    # Consecutive messages with the same content share one
+                    # serialized template; only the To header is added
+                    content = (smtp_account.smtp_user, subject, body, html)
+                    if content != template_content:
+                        template = smtp_mime.prebuild(*content)
+                        template_content = content
+                    wire = smtp_mime.render(template, to_email)
+                    smtp_pool.sendmail(smtp_account, smtp_account.smtp_user, [to_email], wire)
+                else:
+                    msg = EmailMessage()
+                    msg['From'] = smtp_account.smtp_user
+                    msg['To'] = to_email
+                    msg['Subject'] = subject
+                    msg.set_content(body, subtype='html' if html else 'plain')
+                    smtp_pool.send_message(smtp_account, msg)
+            except Exception as e:
+                logger.error(f"Bulk send to {to_email} failed on SMTP account {smtp_account.id}: {e}")
+                smtp_account.mark_failure()
+                reset.discard(smtp_account.pk)
+                smtp_account = None
+                yield to_email, False, str(e)
+                continue
+
+            batch_sent += 1
+            # Reset on the account's first success (since its last failure),
+            # not once per message, and before yielding so a caller that
+            # stops early doesn't skip it
+            if smtp_account.pk not in reset:
+                smtp_account.reset_failures()
+                reset.add(smtp_account.pk)
+            yield to_email, True, None
+
 class SMTPAccount(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="smtp_accounts")
     smtp_host = models.CharField(max_length=255)
@@ -132,8 +233,18 @@ class SMTPAccount(models.Model):
 
     objects = SMTPAccountManager()
 
+    class Meta:
+        # Covers the rotation pick: filter(user=..., status="active", rotation_group=...)
+        indexes = [
+            models.Index(fields=["user", "status", "rotation_group"], name="smtp_user_status_rot_idx"),
+        ]
+
     def get_password(self):
         """Get decrypted password with error handling."""
+        key = (self.pk, self.smtp_password_encrypted)
+        password = _password_cache.get(key)
+        if password:
+            return password
         try:
             password = decrypt(self.smtp_password_encrypted)
             if not password:
@@ -141,6 +252,8 @@ class SMTPAccount(models.Model):
                 logger.warning(f"Empty password after decryption for SMTP account {self.id}")
                 self.status = "failed"
                 self.save(update_fields=["status"])
+            else:
+                _cache_password(key, password)
             return password
         except Exception as e:
             # Log the error and mark account as failed
@@ -149,12 +262,33 @@ class SMTPAccount(models.Model):
             self.save(update_fields=["status"])
             return ""
 
-    def mark_failure(self):
+    def mark_failure(self, failure_threshold=3):
         """Increment failure counter and auto-disable if needed."""
-        self.failure_count += 1
-        self.last_health_check = timezone.now()
-        self.save(update_fields=["failure_count", "last_health_check"])
-        self.__class__.objects.disable_if_failed(self)
+        now = timezone.now()
+        # One atomic UPDATE: the increment and the threshold check both use
+        # the stored count, so concurrent workers never lose a failure
+        account = self.__class__.objects.filter(pk=self.pk)
+        account.update(
+            failure_count=F("failure_count") + 1,
+            last_health_check=now,
+            updated_at=now,  # update() skips auto_now
+            status=Case(
+                When(failure_count__gte=failure_threshold - 1, then=Value("disabled")),
+                default=F("status"),
+            ),
+        )
+        # Read back the stored values; this copy may be stale
+        self.status, self.failure_count = account.values_list("status", "failure_count").get()
+        self.last_health_check = now
+        self.updated_at = now
+        if self.failure_count == failure_threshold and self.status == "disabled":
+            # This failure disabled the account. update() sends no signals,
+            # so let the post_save receivers (analytics counters) see it
+            post_save.send(
+                sender=self.__class__, instance=self, created=False,
+                update_fields=frozenset({"failure_count", "status"}),
+                raw=False, using=account.db,
+            )
 
     def reset_failures(self):
         """Reset failure count and restore active status."""
@@ -164,7 +298,15 @@ class SMTPAccount(models.Model):
         self.save(update_fields=["failure_count", "status", "last_health_check"])
     
     def test_connection(self):
-        """Test the SMTP connection with current credentials."""
+        """
+        Test the SMTP connection with current credentials.
+        A live pooled session only needs a NOOP; the full TLS + AUTH
+        handshake runs when there is none or it has gone stale.
+        """
+        if smtp_pool.ping(self):
+            self.reset_failures()
+            return True, "Connection successful"
+
         try:
             password = self.get_password()
             if not password:
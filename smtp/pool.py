@@ -0,0 +1,155 @@
+# smtp/pool.py
+"""
+Per-thread pool of logged-in SMTP sessions keyed by (host, port, user).
+
+Bulk sends reuse one session per account instead of paying a TLS
+handshake and AUTH round-trip for every message. A session is recycled
+after SMTP_POOL_MAX_MESSAGES sends or SMTP_POOL_MAX_AGE seconds, and is
+checked with NOOP before reuse.
+"""
+import atexit
+import smtplib
+import ssl
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+_local = threading.local()
+
+
+def _connections():
+    # key -> [server, sent_count, opened_at]
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    return connections
+
+
+def _key(smtp_account):
+    return (smtp_account.smtp_host, smtp_account.smtp_port, smtp_account.smtp_user)
+
+
+def _connect(smtp_account):
+    password = smtp_account.get_password()
+    if not password:
+        raise ValidationError(f"SMTP account {smtp_account.smtp_user} has invalid credentials")
+
+    timeout = getattr(settings, "SMTP_TIMEOUT", 30)
+    if smtp_account.smtp_port == 465:
+        server = smtplib.SMTP_SSL(
+            smtp_account.smtp_host, smtp_account.smtp_port,
+            timeout=timeout, context=ssl.create_default_context(),
+        )
+    else:
+        server = smtplib.SMTP(smtp_account.smtp_host, smtp_account.smtp_port, timeout=timeout)
+        server.starttls()
+    server.login(smtp_account.smtp_user, password)
+    return server
+
+
+def _is_alive(server):
+    try:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def acquire(smtp_account):
+    """Return a live, logged-in session for the account, opening one if needed."""
+    connections = _connections()
+    entry = connections.get(_key(smtp_account))
+    if entry is not None:
+        server, sent, opened_at = entry
+        max_age = getattr(settings, "SMTP_POOL_MAX_AGE", 300)
+        if time.monotonic() - opened_at < max_age and _is_alive(server):
+            return server
+        discard(smtp_account)
+
+    server = _connect(smtp_account)
+    connections[_key(smtp_account)] = [server, 0, time.monotonic()]
+    return server
+
+
+def peek(smtp_account):
+    """Return the account's pooled session without opening one, or None."""
+    entry = _connections().get(_key(smtp_account))
+    return entry[0] if entry is not None else None
+
+
+def ping(smtp_account):
+    """
+    NOOP the account's pooled session. Returns True if it answered,
+    False if it was dead (and is dropped), None if nothing is pooled.
+    """
+    server = peek(smtp_account)
+    if server is None:
+        return None
+    if _is_alive(server):
+        return True
+    discard(smtp_account)
+    return False
+
+
+def discard(smtp_account):
+    """Close and forget the account's pooled session, if any."""
+    entry = _connections().pop(_key(smtp_account), None)
+    if entry is not None:
+        _close(entry[0])
+
+
+def _close(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _record_send(smtp_account):
+    entry = _connections().get(_key(smtp_account))
+    if entry is None:
+        return
+    entry[1] += 1
+    if entry[1] >= getattr(settings, "SMTP_POOL_MAX_MESSAGES", 10000):
+        discard(smtp_account)
+
+
+def _run(smtp_account, operation):
+    # A pooled session can drop between the NOOP and the send; retry once
+    # on a fresh session in that case
+    for attempt in range(2):
+        server = acquire(smtp_account)
+        try:
+            result = operation(server)
+        except smtplib.SMTPServerDisconnected:
+            discard(smtp_account)
+            if attempt:
+                raise
+            continue
+        except Exception:
+            discard(smtp_account)
+            raise
+        _record_send(smtp_account)
+        return result
+
+
+def sendmail(smtp_account, from_addr, to_addrs, msg):
+    """server.sendmail() on the account's pooled session."""
+    return _run(smtp_account, lambda server: server.sendmail(from_addr, to_addrs, msg))
+
+
+def send_message(smtp_account, msg):
+    """server.send_message() on the account's pooled session."""
+    return _run(smtp_account, lambda server: server.send_message(msg))
+
+
+def close_all():
+    """Close every session pooled by the current thread."""
+    connections = _connections()
+    while connections:
+        _, entry = connections.popitem()
+        _close(entry[0])
+
+
+atexit.register(close_all)
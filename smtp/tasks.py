@@ -0,0 +1,55 @@
+# smtp/tasks.py
+from django.conf import settings
+
+from queues.services import enqueue_job, job_handler
+from .models import SMTPAccount
+
+SEND_EMAIL_JOB = "send_email"
+
+
+def queue_email(user, to_email, subject, body, html=False, rotation_group=None, specific_account=None, priority=0):
+    """
+    Queue an email for sending by `process_jobs` instead of blocking the
+    caller on the SMTP handshake. Returns the QueueJob.
+    """
+    payload = {
+        "to_email": to_email,
+        "subject": subject,
+        "body": body,
+        "html": html,
+        "rotation_group": rotation_group,
+        "account_id": specific_account.id if specific_account else None,
+    }
+    return enqueue_job(
+        user,
+        SEND_EMAIL_JOB,
+        payload,
+        priority=priority,
+        max_retries=getattr(settings, "SMTP_SEND_MAX_RETRIES", 5),
+    )
+
+
+@job_handler(SEND_EMAIL_JOB)
+def send_email(job):
+    """
+    Send a queued email. The account is looked up again at send time, and
+    only the final failed attempt counts against it, so errors that a retry
+    clears never disable the account.
+    """
+    payload = job.payload
+    specific_account = None
+    if payload.get("account_id"):
+        specific_account = SMTPAccount.objects.get(pk=payload["account_id"], user=job.user)
+    smtp_account = SMTPAccount.objects.get_smtp_for_sending(job.user, payload.get("rotation_group"), specific_account)
+
+    try:
+        SMTPAccount.objects.deliver(
+            smtp_account, payload["to_email"], payload["subject"], payload["body"], payload.get("html", False)
+        )
+    except Exception:
+        if job.retry_count + 1 >= job.max_retries:
+            smtp_account.mark_failure()
+        raise
+
+    smtp_account.reset_failures()
+    return {"smtp_account_id": smtp_account.id}
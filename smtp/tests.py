@@ -1,15 +1,23 @@
 # smtp/tests.py
 import smtplib
+from email import message_from_bytes, policy
 from django.test import TestCase
 from unittest.mock import patch, MagicMock
 from django.core.exceptions import ValidationError
 from users.models import User
-from .models import SMTPAccount
+from core.encryption import encrypt, decrypt
+from queues.services import run_job
+from .models import SMTPAccount, _password_cache
+from . import mime as smtp_mime
+from . import pool as smtp_pool
+from .tasks import queue_email
 
 
 class SMTPAccountTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(email="user@test.com", password="pass123")
+        # Pooled sessions from earlier tests hold other mocks
+        smtp_pool.close_all()
 
     @patch("smtplib.SMTP")
     def test_create_smtp_account(self, mock_smtp):
@@ -263,6 +271,38 @@ class SMTPAccountTests(TestCase):
         instance.login.assert_called_once_with("mailer@test.com", "secret123")
         instance.quit.assert_called_once()
 
+    @patch("smtplib.SMTP")
+    def test_test_connection_uses_noop_on_pooled_session(self, mock_smtp):
+        """A live pooled session is health-checked with NOOP, without a new login."""
+        instance = MagicMock()
+        instance.noop.return_value = (250, b"OK")
+        mock_smtp.return_value = instance
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        smtp_pool.acquire(account)
+        mock_smtp.reset_mock()
+        instance.reset_mock()
+        instance.noop.return_value = (250, b"OK")
+
+        success, message = account.test_connection()
+
+        self.assertTrue(success)
+        instance.noop.assert_called_once()
+        instance.login.assert_not_called()
+        mock_smtp.assert_not_called()
+
+        # A dead session falls back to the full handshake
+        instance.noop.side_effect = smtplib.SMTPServerDisconnected()
+        success, message = account.test_connection()
+        self.assertTrue(success)
+        instance.login.assert_called_once_with("mailer@test.com", "secret123")
+        self.assertIsNone(smtp_pool.peek(account))
+
     @patch("smtplib.SMTP")
     def test_test_connection_authentication_failure(self, mock_smtp):
         """Test the test_connection method with authentication failure."""
@@ -307,4 +347,255 @@ class SMTPAccountTests(TestCase):
         )
         
         str_repr = str(account)
-        self.assertEqual(str_repr, "mailer@test.com@smtp.test.com (active)")
\ No newline at end of file
+        self.assertEqual(str_repr, "mailer@test.com@smtp.test.com (active)")
+
+    @patch("smtplib.SMTP")
+    def test_queued_email_is_sent_by_job(self, mock_smtp):
+        """queue_email returns immediately; the job performs the send."""
+        instance = MagicMock()
+        mock_smtp.return_value = instance
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        instance.reset_mock()
+
+        job = queue_email(self.user, "recipient@test.com", "Hello", "Test email", specific_account=account)
+        instance.sendmail.assert_not_called()
+
+        self.assertTrue(run_job(job))
+        instance.sendmail.assert_called_once()
+        job.refresh_from_db()
+        self.assertEqual(job.payload["result"], {"smtp_account_id": account.id})
+
+    @patch("smtplib.SMTP")
+    def test_queued_email_retries_before_marking_failure(self, mock_smtp):
+        """Only the last failed attempt of a queued send counts against the account."""
+        instance = MagicMock()
+        mock_smtp.return_value = instance
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        instance.sendmail.side_effect = smtplib.SMTPServerDisconnected("gone")
+
+        job = queue_email(self.user, "recipient@test.com", "Hello", "Test email", specific_account=account)
+        for attempt in range(job.max_retries):
+            job.refresh_from_db()
+            self.assertFalse(run_job(job))
+            account.refresh_from_db()
+            expected = 1 if attempt == job.max_retries - 1 else 0
+            self.assertEqual(account.failure_count, expected)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertGreater(job.scheduled_for, job.created_at)
+
+    @patch("smtplib.SMTP")
+    def test_pooled_session_is_reused_across_sends(self, mock_smtp):
+        """Consecutive sends through one account share a single SMTP login."""
+        instance = MagicMock()
+        instance.noop.return_value = (250, b"OK")
+        mock_smtp.return_value = instance
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        mock_smtp.reset_mock()
+        instance.reset_mock()
+        instance.noop.return_value = (250, b"OK")
+
+        for i in range(3):
+            SMTPAccount.objects.send_email(
+                user=self.user, to_email=f"r{i}@test.com", subject="Hi", body="Body", specific_account=account
+            )
+        mock_smtp.assert_called_once()
+        instance.login.assert_called_once()
+        self.assertEqual(instance.sendmail.call_count, 3)
+
+    @patch("smtplib.SMTP")
+    def test_dead_pooled_session_is_replaced(self, mock_smtp):
+        """A session failing its NOOP check is dropped and a new one opened."""
+        instance = MagicMock()
+        mock_smtp.return_value = instance
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        mock_smtp.reset_mock()
+
+        smtp_pool.sendmail(account, "mailer@test.com", "a@test.com", "msg")
+        instance.noop.side_effect = smtplib.SMTPServerDisconnected("gone")
+        smtp_pool.sendmail(account, "mailer@test.com", "b@test.com", "msg")
+        self.assertEqual(mock_smtp.call_count, 2)
+
+    @patch("smtplib.SMTP")
+    def test_rotation_pick_is_a_single_query(self, mock_smtp):
+        """The random rotation pick happens in SQL and loads only the chosen row."""
+        mock_smtp.return_value = MagicMock()
+        accounts = [
+            SMTPAccount.objects.create_smtp(
+                user=self.user,
+                host=f"smtp{i}.test.com",
+                port=587,
+                smtp_user=f"mailer{i}@test.com",
+                smtp_password="secret123",
+                rotation_group="group1"
+            ) for i in range(3)
+        ]
+        with self.assertNumQueries(1):
+            picked = SMTPAccount.objects.get_smtp_for_sending(self.user, rotation_group="group1")
+        self.assertIn(picked, accounts)
+
+        with self.assertRaises(ValidationError):
+            SMTPAccount.objects.get_smtp_for_sending(self.user, rotation_group="missing")
+
+    @patch("smtplib.SMTP")
+    def test_mark_failure_is_one_update(self, mock_smtp):
+        """Counting a failure and disabling at the threshold share one UPDATE."""
+        mock_smtp.return_value = MagicMock()
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        # A stale copy must not overwrite failures recorded through another
+        stale = SMTPAccount.objects.get(pk=account.pk)
+        account.mark_failure()
+        with self.assertNumQueries(2):  # UPDATE + read back
+            account.mark_failure()
+
+        stale.mark_failure()
+        self.assertEqual((stale.failure_count, stale.status), (3, "disabled"))
+
+        account.refresh_from_db()
+        self.assertEqual(account.failure_count, 3)
+        self.assertEqual(account.status, "disabled")
+        self.assertEqual(account.updated_at, account.last_health_check)
+
+    @patch("smtplib.SMTP")
+    def test_send_bulk_uses_one_session(self, mock_smtp):
+        """send_bulk streams per-message results over a single pooled login."""
+        instance = MagicMock()
+        instance.noop.return_value = (250, b"OK")
+        mock_smtp.return_value = instance
+        SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        instance.reset_mock()
+        instance.noop.return_value = (250, b"OK")
+
+        outbox = [(f"r{i}@test.com", "Hi", "<p>Body</p>", True) for i in range(3)]
+        results = list(SMTPAccount.objects.send_bulk(self.user, outbox))
+
+        self.assertEqual(results, [(to, True, None) for to, *_ in outbox])
+        instance.login.assert_called_once()
+        self.assertEqual(instance.sendmail.call_count, 3)
+        from_addr, to_addrs, wire = instance.sendmail.call_args_list[0].args
+        self.assertEqual((from_addr, to_addrs), ("mailer@test.com", ["r0@test.com"]))
+        sent = message_from_bytes(wire, policy=policy.SMTP)
+        self.assertEqual(sent["To"], "r0@test.com")
+        self.assertEqual(sent.get_content_type(), "text/html")
+
+    @patch("smtplib.SMTP")
+    def test_send_bulk_resets_failures_as_it_goes(self, mock_smtp):
+        """An account is reset on its first delivery, even if the caller stops early."""
+        instance = MagicMock()
+        instance.noop.return_value = (250, b"OK")
+        mock_smtp.return_value = instance
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        SMTPAccount.objects.filter(pk=account.pk).update(failure_count=2)
+
+        outbox = [(f"r{i}@test.com", "Hi", "Body", False) for i in range(3)]
+        results = SMTPAccount.objects.send_bulk(self.user, outbox)
+        self.assertEqual(next(results), ("r0@test.com", True, None))
+        account.refresh_from_db()
+        self.assertEqual(account.failure_count, 0)
+
+    def test_send_bulk_without_accounts_fails_each_message(self):
+        """No active account is reported per message instead of raising mid-stream."""
+        outbox = [(f"r{i}@test.com", "Hi", "Body", False) for i in range(2)]
+        results = list(SMTPAccount.objects.send_bulk(self.user, outbox))
+        self.assertEqual([(to, ok) for to, ok, _ in results], [("r0@test.com", False), ("r1@test.com", False)])
+        self.assertIn("No active SMTP accounts", results[0][2])
+
+    def test_mime_template_renders_per_recipient(self):
+        """A prebuilt template only gains a To header; unsafe addresses are refused."""
+        template = smtp_mime.prebuild("mailer@test.com", "Hi", "Hello {{TO}}")
+        sent = message_from_bytes(smtp_mime.render(template, "a@test.com"), policy=policy.SMTP)
+        self.assertEqual(sent["To"], "a@test.com")
+        self.assertEqual(sent["From"], "mailer@test.com")
+        self.assertEqual(sent.get_content().strip(), "Hello {{TO}}")
+        self.assertFalse(smtp_mime.can_render("a@test.com\r\nBcc: x@test.com"))
+        self.assertFalse(smtp_mime.can_render("jos\u00e9@test.com"))
+
+    @patch("smtplib.SMTP")
+    def test_decrypted_password_is_cached_per_ciphertext(self, mock_smtp):
+        """Repeat get_password calls skip decryption until the ciphertext changes."""
+        mock_smtp.return_value = MagicMock()
+        account = SMTPAccount.objects.create_smtp(
+            user=self.user,
+            host="smtp.test.com",
+            port=587,
+            smtp_user="mailer@test.com",
+            smtp_password="secret123"
+        )
+        with patch("smtp.models.decrypt", wraps=decrypt) as mock_decrypt:
+            self.assertEqual(account.get_password(), "secret123")
+            self.assertEqual(account.get_password(), "secret123")
+            self.assertEqual(mock_decrypt.call_count, 1)
+
+            account.smtp_password_encrypted = encrypt("rotated456")
+            account.save()
+            self.assertEqual(account.get_password(), "rotated456")
+            self.assertEqual(mock_decrypt.call_count, 2)
+
+    @patch("smtplib.SMTP")
+    def test_preload_passwords_decrypts_active_accounts_once(self, mock_smtp):
+        """preload_passwords fills the cache so later get_password calls never decrypt."""
+        mock_smtp.return_value = MagicMock()
+        accounts = [
+            SMTPAccount.objects.create_smtp(
+                user=self.user,
+                host="smtp.test.com",
+                port=587,
+                smtp_user=f"mailer{i}@test.com",
+                smtp_password=f"secret{i}"
+            )
+            for i in range(3)
+        ]
+        accounts[2].status = "disabled"
+        accounts[2].save()
+        _password_cache.clear()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(SMTPAccount.objects.preload_passwords(user=self.user), 2)
+
+        with patch("smtp.models.decrypt") as mock_decrypt:
+            self.assertEqual(accounts[0].get_password(), "secret0")
+            self.assertEqual(accounts[1].get_password(), "secret1")
+            mock_decrypt.assert_not_called()
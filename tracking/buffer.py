@@ -0,0 +1,22 @@
+# tracking/buffer.py
+"""
+In-process click write buffer (core/write_buffer.py).
+
+Clicks are written with one bulk_create per flush instead of one INSERT
+per request, once CLICK_BUFFER_SIZE clicks are pending or the oldest is
+CLICK_BUFFER_MAX_AGE seconds old.
+"""
+from core.write_buffer import WriteBuffer
+
+
+def _write_clicks(batch):
+    from .models import Click
+
+    Click.objects.bulk_create(batch, batch_size=500)
+
+
+click_buffer = WriteBuffer("clicks", _write_clicks, "CLICK_BUFFER_SIZE", "CLICK_BUFFER_MAX_AGE")
+
+# Queue an unsaved Click / write every pending click (returns the count)
+buffer_click = click_buffer.add
+flush_clicks = click_buffer.flush
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-15 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_system', '0003_contact_groups'),
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='click',
+            name='tracking_cl_beacon__31cb3e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='click',
+            name='tracking_cl_clicked_9bf185_idx',
+        ),
+        migrations.AddIndex(
+            model_name='click',
+            index=models.Index(fields=['beacon_uuid', '-clicked_at'], name='click_uuid_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='click',
+            index=models.Index(fields=['message', '-clicked_at'], name='click_msg_time_idx'),
+        ),
+    ]
@@ -1,28 +1,30 @@
 # tracking/models.py
 from django.db import models
 from django.utils import timezone
-from message_system.models import Message
-import hashlib
+from message_system.models import Message, coarse_user_agent, hash_ip
+from .buffer import buffer_click
 
 
 # -------------------- Click Manager --------------------
 class ClickManager(models.Manager):
-    def record_click(self, message, url, raw_ip=None, user_agent_family="", beacon_uuid=None):
+    def record_click(self, message, url, raw_ip=None, user_agent_family="", beacon_uuid=None, buffered=False):
         """
         Canonical entry point for recording clicks.
         Handles IP hashing and user agent truncation for privacy.
+        With `buffered=True` the click is queued for a batched insert
+        (tracking/buffer.py) and returned unsaved.
         """
         if beacon_uuid is None:
-            beacon_uuid = message.uuid
+            beacon_uuid = str(message.uuid)
 
         ip_hash = None
         if raw_ip:
-            ip_hash = hashlib.sha256(raw_ip.encode("utf-8")).hexdigest()
+            ip_hash = hash_ip(raw_ip)
 
         if user_agent_family:
-            user_agent_family = user_agent_family.split("/")[0][:50]
+            user_agent_family = coarse_user_agent(user_agent_family)
 
-        return self.create(
+        click = self.model(
             message=message,
             url=url,
             beacon_uuid=beacon_uuid,
@@ -30,6 +32,11 @@ class ClickManager(models.Manager):
             user_agent_family=user_agent_family,
             clicked_at=timezone.now(),
         )
+        if buffered:
+            buffer_click(click)
+        else:
+            click.save(using=self._db)
+        return click
 
 
 # -------------------- Click Model --------------------
@@ -52,15 +59,16 @@ class Click(models.Model):
     objects = ClickManager()
 
     class Meta:
+        # Click lookups filter by beacon or message and order by newest first
         indexes = [
-            models.Index(fields=["beacon_uuid"]),
-            models.Index(fields=["clicked_at"]),
+            models.Index(fields=["beacon_uuid", "-clicked_at"], name="click_uuid_time_idx"),
+            models.Index(fields=["message", "-clicked_at"], name="click_msg_time_idx"),
         ]
 
     def save(self, *args, **kwargs):
         # Defensive: truncate user agent
         if self.user_agent_family:
-            self.user_agent_family = self.user_agent_family.split("/")[0][:50]
+            self.user_agent_family = coarse_user_agent(self.user_agent_family)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1,11 +1,16 @@
 # tracking/tests.py
 
+import hashlib
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from message_system.models import Message
 from campaigns.models import Campaign
 from plans.models import Plan
-from .models import Click
+from unittest.mock import patch
+from django.db import DatabaseError
+from rest_framework.test import APIClient
+from .buffer import buffer_click, flush_clicks
+from .models import Click, hash_ip
 
 User = get_user_model()
 
@@ -37,3 +42,54 @@ class TrackingSmokeTest(TestCase):
         self.assertEqual(click.url, "https://example.com")
         self.assertEqual(click.beacon_uuid, self.message.uuid)
         self.assertEqual(click.message, self.message)
+
+    def test_record_click_hashes_ip_with_keyed_blake2b(self):
+        """Click IPs are stored as a 32-char keyed hash, never in the clear."""
+        click = Click.objects.record_click(self.message, "https://example.com", raw_ip="1.2.3.4")
+        self.assertEqual(len(click.ip_hash), 32)
+        self.assertEqual(click.ip_hash, hash_ip("1.2.3.4"))
+        self.assertNotEqual(click.ip_hash, hash_ip("1.2.3.5"))
+        self.assertNotEqual(click.ip_hash, hashlib.sha256(b"1.2.3.4").hexdigest()[:32])
+
+    def test_click_endpoint_buffers_inserts(self):
+        """Clicks posted to the endpoint are written together on flush."""
+        client = APIClient()
+        with self.settings(CLICK_BUFFER_SIZE=3, CLICK_BUFFER_MAX_AGE=60):
+            for _ in range(2):
+                response = client.post(
+                    "/api/tracking/clicks/",
+                    {"beacon_uuid": self.message.uuid, "url": "https://example.com", "ip": "1.2.3.4"},
+                    format="json",
+                )
+                self.assertEqual(response.status_code, 202)
+                self.assertNotIn("id", response.data)
+                self.assertEqual(response.data["ip_hash"], hash_ip("1.2.3.4"))
+            self.assertEqual(Click.objects.count(), 0)
+
+            with self.assertNumQueries(2):  # message lookup + one bulk INSERT
+                client.post(
+                    "/api/tracking/clicks/",
+                    {"beacon_uuid": self.message.uuid, "url": "https://example.com"},
+                    format="json",
+                )
+        self.assertEqual(Click.objects.filter(message=self.message).count(), 3)
+        self.assertEqual(flush_clicks(), 0)
+
+    def test_click_endpoint_rejects_malformed_uuid(self):
+        """A beacon_uuid that isn't a UUID is a 404, like an unknown one."""
+        response = APIClient().post(
+            "/api/tracking/clicks/",
+            {"beacon_uuid": "not-a-uuid", "url": "https://example.com"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_click_flush_is_requeued(self):
+        """A batch that fails to write stays queued for the next flush."""
+        with self.settings(CLICK_BUFFER_SIZE=10, CLICK_BUFFER_MAX_AGE=60):
+            buffer_click(Click(message=self.message, url="https://example.com", beacon_uuid=self.message.uuid))
+            with patch.object(Click.objects, "bulk_create", side_effect=DatabaseError("locked")):
+                self.assertEqual(flush_clicks(), 0)
+            self.assertEqual(Click.objects.count(), 0)
+            self.assertEqual(flush_clicks(), 1)
+        self.assertEqual(Click.objects.count(), 1)
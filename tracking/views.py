@@ -1,10 +1,10 @@
 # tracking/views.py
+from django.core.exceptions import ValidationError
 from rest_framework import status, generics
 from rest_framework.response import Response
 from .models import Click
 from .serializers import ClickSerializer
 from message_system.models import Message
-import hashlib
 
 class RecordClickView(generics.CreateAPIView):
     """
@@ -21,16 +21,19 @@ class RecordClickView(generics.CreateAPIView):
 
         try:
             message = Message.objects.get(uuid=beacon_uuid)
-        except Message.DoesNotExist:
+        except (Message.DoesNotExist, ValidationError):
+            # A malformed beacon_uuid can't match any message either
             return Response({"detail": "Message not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        ip_hash = hashlib.sha256(raw_ip.encode("utf-8")).hexdigest() if raw_ip else None
-        click = Click.objects.create(
-            message=message,
+        # Buffered: the INSERT is batched with other clicks (tracking/buffer.py)
+        click = Click.objects.record_click(
+            message,
+            url,
+            raw_ip=raw_ip,
+            user_agent_family=user_agent,
             beacon_uuid=beacon_uuid,
-            url=url,
-            ip_hash=ip_hash,
-            user_agent_family=user_agent
+            buffered=True,
         )
+        # Accepted, not Created: the row is written by a later flush
         serializer = self.get_serializer(click)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
@@ -1,6 +1,7 @@
 # users/models.py
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager, Group, Permission
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
 
 
@@ -26,6 +27,16 @@ class UserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def with_plan(self):
+        """
+        Annotate each user with the plan_type of their latest plan, so
+        reading user.plan_type over a list of users costs no extra queries.
+        """
+        from plans.models import Plan  # plans.models imports User
+
+        latest = Plan.objects.filter(user=OuterRef("pk")).order_by("-id").values("plan_type")[:1]
+        return self.get_queryset().annotate(_plan_type=Subquery(latest))
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
@@ -89,6 +100,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         """
         Returns the plan_type of the user's latest plan.
         Defaults to 'free' if no plan is assigned.
+        Uses the User.objects.with_plan() annotation when present.
         """
+        if "_plan_type" in self.__dict__:
+            return self._plan_type or "free"
         plan = self.current_plan
         return plan.plan_type if plan else "free"
\ No newline at end of file
@@ -45,6 +45,18 @@ class UserModelTests(TestCase):
         self.assertIsNotNone(plan)
         self.assertEqual(plan.plan_type, "premium")  # updated from plan.name -> plan.plan_type
 
+    def test_with_plan_annotates_latest_plan_type(self):
+        premium = User.objects.create_user(email="latest@test.com", password="pass123")
+        Plan.objects.create_plan_for_user(premium, "free")
+        Plan.objects.create_plan_for_user(premium, "premium")
+        User.objects.create_user(email="noplan@test.com", password="pass123")
+
+        with self.assertNumQueries(1):
+            plan_types = {user.email: user.plan_type for user in User.objects.with_plan()}
+        self.assertEqual(plan_types["latest@test.com"], "premium")
+        self.assertEqual(plan_types["noplan@test.com"], "free")
+        self.assertEqual(premium.plan_type, "premium")
+
     def test_str_method(self):
         user = User.objects.create_user(email="str@test.com", password="pass123")
         self.assertEqual(str(user), "str@test.com")